@@ -0,0 +1,11 @@
+"""
+Benchmarks for the hot paths in input_algorithms
+
+Run them from the root of the repository with::
+
+    python -m benchmarks.run --output results.json
+
+And compare against an earlier run with::
+
+    python -m benchmarks.run --compare results.json
+"""
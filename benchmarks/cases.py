@@ -0,0 +1,290 @@
+"""
+The benchmark cases
+
+Each case is made with a size and a depth and returns a function that does the
+work being measured. Cases that don't nest ignore the depth.
+"""
+from benchmarks.documents import nested_document, nested_set_options, nested_dictof, digit_strings, words
+
+from input_algorithms.many_item_spec import many_item_formatted_spec
+from input_algorithms.validators import regexed, no_whitespace, no_dots
+from input_algorithms.dictobj import dictobj, recordobj, iter_json
+from input_algorithms import spec_base as sb
+from input_algorithms.meta import Meta
+
+import tempfile
+import io
+
+cases = []
+
+class Case(object):
+    def __init__(self, name, make, covers=(), nests=False):
+        self.name = name
+        self.make = make
+        self.covers = covers
+        self.nests = nests
+
+def case(name, covers=(), nests=False):
+    """Register a function making a benchmark as a case"""
+    def register(make):
+        cases.append(Case(name, make, covers=covers, nests=nests))
+        return make
+    return register
+
+def leaf_case(name, kls, make_spec, make_values):
+    """Register a case that normalises size values one at a time with a spec"""
+    def make(size, depth):
+        meta = Meta({}, [])
+        spec = make_spec()
+        values = make_values(size)
+        def run():
+            for val in values:
+                spec.normalise(meta, val)
+        return run
+    case(name, covers=[kls])(make)
+
+class SimpleFormatter(object):
+    """Formatter for formatted specs that replaces "{key}" with that key from the options"""
+    def __init__(self, all_options, option_path, value):
+        self.value = value
+        self.all_options = all_options
+
+    def format(self):
+        if isinstance(self.value, str) and self.value.startswith("{") and self.value.endswith("}"):
+            return self.all_options.get(self.value[1:-1], self.value)
+        return self.value
+
+class port_spec(many_item_formatted_spec):
+    value_name = "Port"
+    specs = [sb.integer_spec()]
+    optional_specs = [sb.string_spec()]
+
+    def create_result(self, port, protocol, meta, val, dividers):
+        return port, protocol
+
+class Thing(dictobj):
+    fields = ["name", "port", ("tags", lambda: []), ("enabled", True)]
+
+class Plain(dictobj):
+    fields = ["name", "port", "tags", "enabled"]
+
+class Record(recordobj):
+    fields = Thing.fields
+
+########################
+###   LEAVES
+########################
+
+leaf_case("pass_through_spec", sb.pass_through_spec, sb.pass_through_spec, digit_strings)
+leaf_case("always_same_spec", sb.always_same_spec, lambda: sb.always_same_spec(1), digit_strings)
+leaf_case("any_spec", sb.any_spec, sb.any_spec, digit_strings)
+leaf_case("overridden", sb.overridden, lambda: sb.overridden(1), digit_strings)
+leaf_case("dictionary_spec", sb.dictionary_spec, sb.dictionary_spec, lambda size: [{}] * size)
+leaf_case("boolean", sb.boolean, sb.boolean, lambda size: [True] * size)
+leaf_case("string_spec", sb.string_spec, sb.string_spec, digit_strings)
+leaf_case("integer_spec", sb.integer_spec, sb.integer_spec, digit_strings)
+leaf_case("float_spec", sb.float_spec, sb.float_spec, digit_strings)
+leaf_case("string_or_int_as_string_spec", sb.string_or_int_as_string_spec, sb.string_or_int_as_string_spec, lambda size: list(range(size)))
+leaf_case("valid_string_spec", sb.valid_string_spec, lambda: sb.valid_string_spec(no_whitespace(), regexed("[a-z]+")), words)
+leaf_case("valid_string_spec_combined", sb.valid_string_spec, lambda: sb.valid_string_spec(no_whitespace(), no_dots(), regexed("[a-z]+", "[a-z]{3}"), combined=True), words)
+leaf_case("valid_string_spec_uncombined", sb.valid_string_spec, lambda: sb.valid_string_spec(no_whitespace(), no_dots(), regexed("[a-z]+", "[a-z]{3}")), words)
+leaf_case("string_choice_spec", sb.string_choice_spec, lambda: sb.string_choice_spec(["one", "two", "three", "four"]), words)
+leaf_case("file_spec", sb.file_spec, sb.file_spec, lambda size: [io.StringIO()] * size)
+leaf_case("required", sb.required, lambda: sb.required(sb.string_spec()), digit_strings)
+leaf_case("defaulted", sb.defaulted, lambda: sb.defaulted(sb.string_spec(), "dflt"), lambda size: [sb.NotSpecified] * size)
+leaf_case("optional_spec", sb.optional_spec, lambda: sb.optional_spec(sb.string_spec()), lambda size: [sb.NotSpecified, "a"] * (size // 2))
+leaf_case("or_spec", sb.or_spec, lambda: sb.or_spec(sb.boolean(), sb.integer_spec(), sb.float_spec(), sb.dictionary_spec(), sb.string_spec()), words)
+leaf_case("match_spec", sb.match_spec, lambda: sb.match_spec((bool, sb.boolean()), (int, sb.integer_spec()), (float, sb.float_spec()), (dict, sb.dictionary_spec()), (str, sb.string_spec())), words)
+leaf_case("and_spec", sb.and_spec, lambda: sb.and_spec(sb.string_spec(), sb.valid_string_spec(no_whitespace()), sb.integer_spec()), digit_strings)
+leaf_case("container_spec", sb.container_spec, lambda: sb.container_spec(list, sb.listof(sb.string_spec())), digit_strings)
+leaf_case("delayed", sb.delayed, lambda: sb.delayed(sb.string_spec()), digit_strings)
+leaf_case("dict_from_bool_spec", sb.dict_from_bool_spec, lambda: sb.dict_from_bool_spec(lambda meta, val: {"enabled": val}, sb.set_options(enabled=sb.boolean())), lambda size: [True] * size)
+leaf_case("fail_fast_spec", sb.fail_fast_spec, lambda: sb.fail_fast_spec(sb.listof(sb.integer_spec())), lambda size: [["1", "2"]] * size)
+leaf_case("memoised", sb.memoised, lambda: sb.memoised(sb.valid_string_spec(no_whitespace(), regexed("[a-z]+"))), words)
+leaf_case("many_item_formatted_spec", many_item_formatted_spec, port_spec, lambda size: ["{0}:tcp".format(index) for index in range(size)])
+
+@case("formatted", covers=[sb.formatted])
+def make(size, depth):
+    meta = Meta({"name": "thing"}, []).at("key")
+    spec = sb.formatted(sb.string_spec(), formatter=SimpleFormatter)
+    def run():
+        for _ in range(size):
+            spec.normalise(meta, "{name}")
+    return run
+
+@case("many_format", covers=[sb.many_format])
+def make(size, depth):
+    meta = Meta({"name": "thing"}, []).at("key")
+    spec = sb.many_format(sb.string_spec(), formatter=SimpleFormatter)
+    def run():
+        for _ in range(size):
+            spec.normalise(meta, "name")
+    return run
+
+@case("filesystem", covers=[sb.filename_spec, sb.directory_spec])
+def make(size, depth):
+    meta = Meta({}, [])
+    directory = tempfile.gettempdir()
+    filename_spec = sb.filename_spec(may_not_exist=True)
+    directory_spec = sb.directory_spec()
+    def run():
+        for _ in range(size):
+            filename_spec.normalise(meta, "/nonexistant/path")
+            directory_spec.normalise(meta, directory)
+    return run
+
+########################
+###   CONTAINERS
+########################
+
+@case("listof", covers=[sb.listof])
+def make(size, depth):
+    meta = Meta({}, [])
+    spec = sb.listof(sb.integer_spec())
+    values = digit_strings(size)
+    return lambda: spec.normalise(meta, values)
+
+@case("listof_ints", covers=[sb.listof])
+def make(size, depth):
+    meta = Meta({}, [])
+    spec = sb.listof(sb.integer_spec())
+    values = list(range(size))
+    return lambda: spec.normalise(meta, values)
+
+@case("streamed_listof", covers=[sb.streamed_listof])
+def make(size, depth):
+    meta = Meta({}, [])
+    spec = sb.streamed_listof(sb.integer_spec())
+    values = digit_strings(size)
+    return lambda: list(spec.normalise(meta, iter(values)))
+
+@case("set_options", covers=[sb.set_options], nests=True)
+def make(size, depth):
+    meta = Meta({}, [])
+    spec = nested_set_options(size, depth, sb.integer_spec)
+    document = nested_document(size, depth)
+    return lambda: spec.normalise(meta, document)
+
+@case("set_options_compiled", covers=[sb.set_options], nests=True)
+def make(size, depth):
+    meta = Meta({}, [])
+    normalise = nested_set_options(size, depth, sb.integer_spec).compile()
+    document = nested_document(size, depth)
+    return lambda: normalise(meta, document)
+
+@case("dictof", covers=[sb.dictof], nests=True)
+def make(size, depth):
+    meta = Meta({}, [])
+    spec = nested_dictof(depth, sb.integer_spec)
+    document = nested_document(size, depth)
+    return lambda: spec.normalise(meta, document)
+
+@case("dictof_errors", covers=[sb.dictof], nests=True)
+def make(size, depth):
+    meta = Meta({}, [])
+    spec = nested_dictof(depth, sb.integer_spec)
+    document = nested_document(size, depth, leaf=lambda index: "nope")
+    def run():
+        try:
+            spec.normalise(meta, document)
+        except sb.BadSpecValue:
+            pass
+    return run
+
+@case("create_spec", covers=[sb.create_spec, dictobj])
+def make(size, depth):
+    meta = Meta({}, [])
+    spec = sb.listof(sb.create_spec(Thing
+        , name = sb.required(sb.string_spec())
+        , port = sb.defaulted(sb.integer_spec(), 80)
+        , tags = sb.listof(sb.string_spec())
+        , enabled = sb.defaulted(sb.boolean(), True)
+        ))
+    values = [{"name": "thing{0}".format(index), "port": str(index), "tags": ["a", "b"]} for index in range(size)]
+    return lambda: spec.normalise(meta, values)
+
+########################
+###   DICTOBJ
+########################
+
+@case("dictobj_create", covers=[dictobj])
+def make(size, depth):
+    def run():
+        for index in range(size):
+            Thing(name="thing", port=index)
+    return run
+
+@case("recordobj_create", covers=[recordobj])
+def make(size, depth):
+    def run():
+        for index in range(size):
+            Record(name="thing", port=index)
+    return run
+
+@case("dictobj_access", covers=[dictobj])
+def make(size, depth):
+    thing = Thing(name="thing", port=80)
+    def run():
+        for _ in range(size):
+            thing.name
+            thing["port"]
+            thing.enabled = False
+    return run
+
+@case("dict_access")
+def make(size, depth):
+    """dictobj_access with a plain dict to compare against"""
+    thing = dict(name="thing", port=80, tags=[], enabled=True)
+    def run():
+        for _ in range(size):
+            thing["name"]
+            thing["port"]
+            thing["enabled"] = False
+    return run
+
+@case("dictobj_as_dict", covers=[dictobj], nests=True)
+def make(size, depth):
+    thing = Thing(name="leaf", port=0)
+    for _ in range(depth):
+        thing = Thing(name=thing, port=0, tags=list(range(size)))
+    return thing.as_dict
+
+@case("dictobj_iter_json", covers=[dictobj], nests=True)
+def make(size, depth):
+    thing = Thing(name="leaf", port=0)
+    for _ in range(depth):
+        thing = Thing(name=thing, port=0, tags=[Thing(name=str(index), port=index) for index in range(size)])
+    return lambda: "".join(iter_json(thing))
+
+@case("dictobj_clone", covers=[dictobj])
+def make(size, depth):
+    thing = Plain(name="thing", port=80, tags=[], enabled=True)
+    def run():
+        for _ in range(size):
+            thing.clone()
+    return run
+
+########################
+###   META
+########################
+
+@case("meta_paths", covers=[Meta], nests=True)
+def make(size, depth):
+    def run():
+        for index in range(size):
+            meta = Meta({}, [])
+            for level in range(depth):
+                meta = meta.at("level{0}".format(level)).indexed_at(index)
+            meta.path
+            meta.nonspecial_path
+    return run
+
+@case("meta_key_names", covers=[Meta], nests=True)
+def make(size, depth):
+    meta = Meta({}, [])
+    for level in range(depth):
+        meta = meta.at("level{0}".format(level))
+    def run():
+        for _ in range(size):
+            meta.key_names()
+    return run
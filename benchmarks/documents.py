@@ -0,0 +1,43 @@
+"""Generators for the values and documents used by the benchmarks"""
+from input_algorithms import spec_base as sb
+
+def width_for(size, depth):
+    """Return how many keys each level needs so depth levels have about size leaves"""
+    return max(1, int(round(size ** (1.0 / depth))))
+
+def nested_document(size, depth, leaf=lambda index: str(index)):
+    """Return nested dictionaries depth levels deep with about size leaves"""
+    width = width_for(size, depth)
+    counter = [0]
+
+    def make(level):
+        if level == depth:
+            counter[0] += 1
+            return leaf(counter[0])
+        return dict(("k{0}".format(index), make(level + 1)) for index in range(width))
+
+    return make(0)
+
+def nested_set_options(size, depth, leaf_spec):
+    """Return set_options specs that match nested_document(size, depth)"""
+    width = width_for(size, depth)
+
+    def make(level):
+        if level == depth:
+            return leaf_spec()
+        return sb.set_options(**dict(("k{0}".format(index), make(level + 1)) for index in range(width)))
+
+    return make(0)
+
+def nested_dictof(depth, leaf_spec):
+    """Return dictof specs that match any nested_document that is depth levels deep"""
+    spec = leaf_spec()
+    for _ in range(depth):
+        spec = sb.dictof(sb.string_spec(), spec)
+    return spec
+
+def digit_strings(size):
+    return [str(index) for index in range(size)]
+
+def words(size, choices=("one", "two", "three", "four")):
+    return [choices[index % len(choices)] for index in range(size)]
@@ -0,0 +1,114 @@
+"""
+Run the benchmarks and write the results as json
+
+Every Spec in input_algorithms.spec_base must be covered by at least one case,
+so new specs can't be added without a benchmark.
+"""
+from benchmarks.cases import cases
+
+from input_algorithms import spec_base as sb
+from input_algorithms import VERSION
+
+import argparse
+import platform
+import inspect
+import json
+import time
+import sys
+
+timer = getattr(time, "perf_counter", time.time)
+
+def spec_classes():
+    """Return all the Spec classes defined in spec_base"""
+    return [kls for _, kls in inspect.getmembers(sb, inspect.isclass)
+        if issubclass(kls, sb.Spec) and kls is not sb.Spec and kls.__module__ == sb.__name__
+        ]
+
+def uncovered_specs():
+    """Return the names of specs from spec_base that no case covers"""
+    covered = set(kls for case in cases for kls in case.covers)
+    return sorted(kls.__name__ for kls in spec_classes() if kls not in covered)
+
+def time_call(func, repeat, min_time):
+    """Return the best seconds per call of func from repeat runs of at least min_time each"""
+    best = None
+    for _ in range(repeat):
+        calls = 0
+        start = timer()
+        while True:
+            func()
+            calls += 1
+            took = timer() - start
+            if took >= min_time:
+                break
+
+        per_call = took / calls
+        if best is None or per_call < best:
+            best = per_call
+    return best
+
+def run_cases(sizes, depths, repeat, min_time, only=None):
+    """Yield a result for each case at each size and depth"""
+    for case in cases:
+        if only and not any(name in case.name for name in only):
+            continue
+
+        for size in sizes:
+            for depth in (depths if case.nests else [1]):
+                seconds = time_call(case.make(size, depth), repeat, min_time)
+                yield {"name": case.name, "size": size, "depth": depth, "seconds": seconds}
+
+def key_for(result):
+    return (result["name"], result["size"], result["depth"])
+
+def compare(results, previous, threshold):
+    """Return [(result, before)] for results that are slower than before by more than threshold"""
+    before = dict((key_for(result), result) for result in previous["results"])
+    slower = []
+    for result in results:
+        old = before.get(key_for(result))
+        if old and result["seconds"] > old["seconds"] * threshold:
+            slower.append((result, old))
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark input_algorithms")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-time", type=float, default=0.05)
+    parser.add_argument("--only", nargs="+", help="Only run cases with any of these in their name")
+    parser.add_argument("--output", help="File to write the json results to")
+    parser.add_argument("--compare", help="Results from a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="How much slower than the comparison counts as a regression")
+    args = parser.parse_args(argv)
+
+    uncovered = uncovered_specs()
+    if uncovered:
+        parser.error("These specs have no benchmark: {0}".format(", ".join(uncovered)))
+
+    results = []
+    for result in run_cases(args.sizes, args.depths, args.repeat, args.min_time, only=args.only):
+        results.append(result)
+        sys.stderr.write("{name:<32} size={size:<8} depth={depth:<4} {micro:12.2f}us\n".format(micro=result["seconds"] * 1e6, **result))
+
+    report = {"version": VERSION, "python": platform.python_version(), "results": results}
+    if args.output:
+        with open(args.output, "w") as fle:
+            json.dump(report, fle, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+    if args.compare:
+        with open(args.compare) as fle:
+            slower = compare(results, json.load(fle), args.threshold)
+        for result, before in slower:
+            sys.stderr.write("SLOWER {name} size={size} depth={depth}: {0:.2f}us -> {1:.2f}us\n".format(before["seconds"] * 1e6, result["seconds"] * 1e6, **result))
+        if slower:
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Asyncio versions of normalise for use with Spec.anormalise
+
+Specs that touch the filesystem (those with touches_filesystem set to True)
+have their normalise run in the event loop's default executor so the loop isn't
+blocked. set_options, dictof and listof normalise their children concurrently
+when some of them touch the filesystem. Any other spec with such a child is
+normalised in the executor as a whole.
+
+Spec trees that don't touch the filesystem at all are normalised with their
+normal synchronous normalise.
+"""
+from input_algorithms.spec_base import Spec, NotSpecified, child_specs, defined_by, failing_fast, set_options, dictof, listof
+from input_algorithms.errors import BadSpec, BadSpecValue
+
+from weakref import WeakKeyDictionary
+import asyncio
+
+touching_filesystem = WeakKeyDictionary()
+
+def touches_filesystem(spec):
+    """Say whether this spec or any of it's children touch the filesystem, remembered per spec"""
+    if not isinstance(spec, Spec):
+        return False
+
+    if spec not in touching_filesystem:
+        # Say no while we look so that specs containing themselves don't recurse forever
+        touching_filesystem[spec] = False
+        touching_filesystem[spec] = spec.touches_filesystem or any(touches_filesystem(child) for child in child_specs(spec))
+    return touching_filesystem[spec]
+
+async def anormalise(spec, meta, val):
+    """Normalise val with spec without blocking the event loop on the filesystem"""
+    if not touches_filesystem(spec):
+        return spec.normalise(meta, val)
+
+    for kls, normaliser in container_normalisers:
+        if isinstance(spec, kls) and defined_by(spec.__class__, "normalise_filled") is kls and not hasattr(spec, "normalise_either"):
+            if val is NotSpecified:
+                return spec.normalise(meta, val)
+            return await normaliser(spec, meta, val)
+
+    return await asyncio.get_event_loop().run_in_executor(None, spec.normalise, meta, val)
+
+async def gather_normalised(meta, awaitables):
+    """
+    Return the results from awaiting all the awaitables concurrently
+
+    Like the synchronous container specs, errors are collected into one error for
+    meta unless the meta is failing fast.
+    """
+    if failing_fast(meta):
+        return await asyncio.gather(*awaitables)
+
+    result = []
+    errors = []
+    for outcome in await asyncio.gather(*awaitables, return_exceptions=True):
+        if isinstance(outcome, BadSpec):
+            errors.append(outcome)
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            result.append(outcome)
+
+    if errors:
+        raise BadSpecValue(meta=meta, _errors=errors)
+
+    return result
+
+async def set_options_anormalise(spec, meta, val):
+    """Normalise each option concurrently"""
+    if not isinstance(val, dict):
+        raise BadSpecValue("Expected a dictionary", meta=meta, got=type(val))
+
+    keys = list(spec.options)
+    values = await gather_normalised(meta, [anormalise(spec.options[key], meta.at(key), val.get(key, NotSpecified)) for key in keys])
+    return dict(zip(keys, values))
+
+async def dictof_anormalise(spec, meta, val):
+    """Normalise each value concurrently"""
+    if not isinstance(val, dict):
+        raise BadSpecValue("Expected a dictionary", meta=meta, got=type(val))
+
+    async def normalise_item(key, value):
+        name = await anormalise(spec.name_spec, meta.at(key), key)
+        if spec.nested and isinstance(value, dict):
+            value_spec = spec.__class__(spec.name_spec, spec.value_spec, nested=spec.nested)
+        else:
+            value_spec = spec.value_spec
+        return name, await anormalise(value_spec, meta.at(key), value)
+
+    return dict(await gather_normalised(meta, [normalise_item(key, value) for key, value in val.items()]))
+
+async def listof_anormalise(spec, meta, val):
+    """Normalise each item concurrently"""
+    if spec.expect is not NotSpecified and isinstance(val, spec.expect):
+        return [val]
+
+    if not isinstance(val, list):
+        val = [val]
+
+    async def normalise_item(index, item):
+        if isinstance(item, spec.expect):
+            return item
+
+        value = await anormalise(spec.spec, meta.indexed_at(index), item)
+        if spec.expect is not NotSpecified and not isinstance(value, spec.expect):
+            raise BadSpecValue("Expected normaliser to create a specific object", expected=spec.expect, meta=meta.indexed_at(index), got=value)
+        return value
+
+    return await gather_normalised(meta, [normalise_item(index, item) for index, item in enumerate(val)])
+
+container_normalisers = [
+      (set_options, set_options_anormalise)
+    , (dictof, dictof_anormalise)
+    , (listof, listof_anormalise)
+    ]
@@ -0,0 +1,212 @@
+"""
+Caches used to avoid normalising the same things over and over
+"""
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+import threading
+import hashlib
+import time
+import six
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+timer = getattr(time, "monotonic", time.time)
+
+class LRU(object):
+    """
+    A mapping of at most maxsize entries that forgets the least recently used first
+
+    If a ttl is given, entries are also forgotten that many seconds after they
+    were set.
+
+    hits and misses count the lookups made with get.
+    """
+    def __init__(self, maxsize=1024, ttl=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.setup()
+
+    def setup(self):
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def __getstate__(self):
+        """Don't share entries or the lock when pickled"""
+        return {"ttl": self.ttl, "maxsize": self.maxsize}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.setup()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return self.get(key, self, count=False) is not self
+
+    def get(self, key, dflt=None, count=True):
+        """Return the value for this key or dflt if we don't have it"""
+        with self.lock:
+            if key in self.entries:
+                expires, value = self.entries.pop(key)
+                if expires is None or expires > timer():
+                    self.entries[key] = (expires, value)
+                    if count:
+                        self.hits += 1
+                    return value
+
+            if count:
+                self.misses += 1
+            return dflt
+
+    def set(self, key, value):
+        """Remember this value for this key, forgetting the oldest entry if we are full"""
+        expires = None if self.ttl is None else timer() + self.ttl
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (expires, value)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def keys(self):
+        """Return a list of the keys we have, least recently used first"""
+        with self.lock:
+            return list(self.entries)
+
+    def invalidate(self, key):
+        """Forget this key"""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """Forget everything and reset our counters"""
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return a dictionary of hits, misses, size and maxsize"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries), "maxsize": self.maxsize}
+
+class Unfingerprintable(Exception):
+    """Raised when something can't be turned into a fingerprint"""
+
+def canonical(val):
+    """
+    Return val as bytes that are the same for equal documents
+
+    Dictionaries are ordered by their keys, and every value is tagged with it's
+    type so that 1, 1.0, True and "1" are all different. Only dictionaries,
+    lists, tuples, strings, numbers, None and classes may be in val.
+    """
+    if val is None or isinstance(val, (bool, float) + six.integer_types):
+        return "{0}:{1!r};".format(type(val).__name__, val).encode("utf-8")
+
+    if isinstance(val, six.text_type):
+        encoded = val.encode("utf-8")
+        return b"u" + str(len(encoded)).encode() + b":" + encoded
+
+    if isinstance(val, bytes):
+        return b"b" + str(len(val)).encode() + b":" + val
+
+    if isinstance(val, type):
+        return "type:{0}.{1};".format(val.__module__, val.__name__).encode("utf-8")
+
+    if isinstance(val, (list, tuple)):
+        items = [canonical(item) for item in val]
+    elif isinstance(val, Mapping):
+        items = sorted(canonical(key) + canonical(val[key]) for key in val)
+    else:
+        raise Unfingerprintable(type(val))
+
+    tag = "{0}.{1}[{2}]".format(type(val).__module__, type(val).__name__, len(items)).encode("utf-8")
+    return tag + b"".join(items) + b";"
+
+def fingerprint(val):
+    """Return a hex digest of val that is the same for equal documents, or None if we can't make one"""
+    try:
+        return hashlib.sha1(canonical(val)).hexdigest()
+    except Unfingerprintable:
+        return None
+
+class DocumentCache(object):
+    """
+    Remember what whole documents normalise into
+
+    Documents are remembered by a fingerprint of their contents along with the
+    spec and the path of the meta they are normalised with. If the spec looks
+    at meta.everything then the fingerprint of meta.everything is included as
+    well. Specs that don't say whether they look at it are assumed to, see
+    input_algorithms.spec_base.reads_everything.
+
+    At most maxsize documents are remembered and the results are shared
+    between everything that normalises the same document, so they shouldn't be
+    changed.
+
+    Whether a spec looks at meta.everything is worked out the first time we see
+    it, so specs shouldn't be changed after they are first used with the cache.
+    """
+    def __init__(self, maxsize=32, ttl=None):
+        self.cache = LRU(maxsize=maxsize, ttl=ttl)
+        self.reading_everything = WeakKeyDictionary()
+
+    def reads_everything(self, spec):
+        """Say whether spec looks at meta.everything, remembered per spec"""
+        try:
+            return self.reading_everything[spec]
+        except KeyError:
+            from input_algorithms.spec_base import reads_everything
+            reads = self.reading_everything[spec] = reads_everything(spec)
+            return reads
+
+    def key_for(self, spec, meta, val):
+        """Return the key for this document or None if it can't be remembered"""
+        document = fingerprint(val)
+        if document is None:
+            return None
+
+        everything = None
+        if meta.everything is not val and self.reads_everything(spec):
+            everything = fingerprint(meta.everything)
+            if everything is None:
+                return None
+
+        return (spec, meta.path, document, everything)
+
+    def normalise(self, spec, meta, val):
+        """Return what we remember for this document or normalise it with the spec"""
+        key = self.key_for(spec, meta, val)
+        if key is None:
+            return spec.normalise(meta, val)
+
+        result = self.cache.get(key, self.cache)
+        if result is self.cache:
+            result = spec.normalise(meta, val)
+            self.cache.set(key, result)
+        return result
+
+    def invalidate(self, spec, meta=None, val=None):
+        """Forget this document, or everything we remember for this spec if no meta and val are given"""
+        if meta is not None:
+            key = self.key_for(spec, meta, val)
+            if key is not None:
+                self.cache.invalidate(key)
+            return
+
+        for key in self.cache.keys():
+            if key[0] is spec:
+                self.cache.invalidate(key)
+
+    def clear(self):
+        """Forget everything"""
+        self.cache.clear()
+
+    def stats(self):
+        """Return the hits, misses and size of our cache"""
+        return self.cache.stats()
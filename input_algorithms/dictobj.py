@@ -1,32 +1,103 @@
+from input_algorithms.caching import LRU
+
 from namedlist import namedlist
+from weakref import WeakKeyDictionary
+import json
+import six
 
 empty_defaults = namedlist("Defaults", [])
-cached_namedlists = {}
+
+# Namedlists shared by dictobj classes with the same fields and defaults
+cached_namedlists = LRU(maxsize=512)
+
+# (fields, namedlist) for each dictobj class, see defaults_for
+defaults_factories = WeakKeyDictionary()
+
+class CallDefault(object):
+    """Stands in for callable defaults in the namedlists made for dictobj"""
+    def __repr__(self):
+        return "<call default>"
+
+call_default = CallDefault()
+
+def calling_defaults(made, callables):
+    """Return a subclass of the namedlist made that calls the callables for fields left as call_default"""
+    class Defaults(made):
+        __slots__ = ()
+
+        def __init__(self, *args, **kwargs):
+            super(Defaults, self).__init__(*args, **kwargs)
+            for name, make in callables.items():
+                if getattr(self, name) is call_default:
+                    setattr(self, name, make())
+    return Defaults
+
+def defaults_for(kls, fields):
+    """
+    Return the namedlist for these fields on this dictobj class
+
+    The namedlist is shared between classes with the same fields and
+    defaults, with callable defaults left as call_default. Classes with
+    callable defaults get a subclass of it that calls them when an instance
+    is made. This is remembered for each class until fields changes.
+    """
+    found = defaults_factories.get(kls)
+    if found is not None and found[0] is fields:
+        return found[1]
+
+    if not fields:
+        made = empty_defaults
+    else:
+        names = []
+        end_fields = []
+        callables = {}
+        for field in fields:
+            if isinstance(field, (tuple, list)):
+                name, dflt = field
+                if callable(dflt):
+                    callables[name] = dflt
+                    dflt = call_default
+                end_fields.append((name, dflt))
+            else:
+                names.append(field)
+
+        joined = names + end_fields
+        identifier = str(joined)
+        made = cached_namedlists.get(identifier, count=False)
+        if made is None:
+            made = namedlist("Defaults", joined)
+            cached_namedlists.set(identifier, made)
+
+        if callables:
+            made = calling_defaults(made, callables)
+
+    defaults_factories[kls] = (fields, made)
+    return made
+
+# The names of the attributes on each dictobj class, see class_attributes
+attribute_names = WeakKeyDictionary()
+
+def class_attributes(kls):
+    """
+    Return the names that hasattr(kls, name) is True for
+
+    These are worked out the first time they are needed for each class, so
+    attributes added to the class after that aren't noticed.
+    """
+    names = attribute_names.get(kls)
+    if names is None:
+        names = set()
+        for parent in kls.__mro__ + type(kls).__mro__:
+            names.update(parent.__dict__)
+        names = attribute_names[kls] = frozenset(names)
+    return names
 
 class dictobj(dict):
     fields = None
 
     def make_defaults(self):
         """Make a namedtuple for extracting our wanted keys"""
-        if not self.fields:
-            return empty_defaults
-        else:
-            fields = []
-            end_fields = []
-            for field in self.fields:
-                if isinstance(field, (tuple, list)):
-                    name, dflt = field
-                    if callable(dflt):
-                        dflt = dflt()
-                    end_fields.append((name, dflt))
-                else:
-                    fields.append(field)
-
-            joined = fields + end_fields
-            identifier = str(joined)
-            if identifier not in cached_namedlists:
-                cached_namedlists[identifier] = namedlist("Defaults", joined)
-            return cached_namedlists[identifier]
+        return defaults_for(self.__class__, self.fields)
 
     def __init__(self, *args, **kwargs):
         super(dictobj, self).__init__()
@@ -39,8 +110,7 @@ class dictobj(dict):
 
     def __getattr__(self, key):
         """Pretend object access"""
-        key = str(key)
-        if key not in self or hasattr(self.__class__, key):
+        if key not in self or key in (attribute_names.get(self.__class__) or class_attributes(self.__class__)):
             return object.__getattribute__(self, key)
 
         try:
@@ -52,15 +122,16 @@ class dictobj(dict):
                 raise
 
     def __getitem__(self, key):
-        key = str(key)
-        if key not in self or hasattr(self.__class__, key):
+        if type(key) is not str:
+            key = str(key)
+        if key not in self or key in (attribute_names.get(self.__class__) or class_attributes(self.__class__)):
             return object.__getattribute__(self, key)
         else:
             return super(dictobj, self).__getitem__(key)
 
     def __setattr__(self, key, val):
         """Pretend object setter access"""
-        if hasattr(self.__class__, key):
+        if key in (attribute_names.get(self.__class__) or class_attributes(self.__class__)):
             object.__setattr__(self, key, val)
         self[key] = val
 
@@ -71,24 +142,340 @@ class dictobj(dict):
             object.__delattr__(self, key)
 
     def __setitem__(self, key, val):
-        if hasattr(self.__class__, key):
+        if key in (attribute_names.get(self.__class__) or class_attributes(self.__class__)):
             object.__setattr__(self, key, val)
         super(dictobj, self).__setitem__(key, val)
 
+    def clone(self, **changes):
+        """
+        Return a shallow copy of this object with any changes applied to the copy
+
+        The copy shares it's values with this object and is made without
+        calling __init__, so defaults aren't made again.
+        """
+        clone = self.__class__.__new__(self.__class__)
+        dict.update(clone, self)
+        clone.__dict__.update(self.__dict__)
+        for key, val in changes.items():
+            clone[key] = val
+        return clone
+
+    def as_dict(self, **kwargs):
+        """Return as a deeply nested dictionary"""
+        return unpack(self, kwargs, walk_root=True)
+
+class RecordMeta(type):
+    """Make __slots__ for the fields of a record that its parents don't already have"""
+    def __new__(metaname, name, bases, attrs):
+        required = []
+        defaulted = []
+        defaults = {}
+        fields = attrs["fields"] if "fields" in attrs else getattr(bases[0], "fields", None)
+        for field in fields or []:
+            if isinstance(field, (tuple, list)):
+                field, dflt = field
+                defaulted.append(field)
+                defaults[field] = dflt
+            else:
+                required.append(field)
+
+        if "__slots__" not in attrs:
+            inherited = set(slot for base in bases for kls in base.__mro__ for slot in getattr(kls, "__slots__", ()))
+            attrs["__slots__"] = tuple(field for field in required + defaulted if field not in inherited)
+
+        attrs["field_names"] = tuple(required + defaulted)
+        attrs["field_defaults"] = defaults
+        return super(RecordMeta, metaname).__new__(metaname, name, bases, attrs)
+
+@six.add_metaclass(RecordMeta)
+class recordobj(object):
+    """
+    Like dictobj but with the values kept in __slots__ instead of a dictionary
+
+    fields is the same as for dictobj, with (name, default) tuples for fields
+    that have defaults, where callable defaults are called for each instance.
+    Like with dictobj, fields with defaults come after the others when given
+    positionally.
+
+    Values can be got and set as attributes or items, but unlike dictobj new
+    keys can't be added.
+    """
+    fields = None
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        names = self.field_names
+        if len(args) > len(names):
+            raise TypeError("{0} takes at most {1} arguments ({2} given)".format(self.__class__.__name__, len(names), len(args)))
+
+        for name, val in zip(names, args):
+            if name in kwargs:
+                raise TypeError("{0} got multiple values for argument '{1}'".format(self.__class__.__name__, name))
+            kwargs[name] = val
+
+        for name in names:
+            if name in kwargs:
+                val = kwargs.pop(name)
+            elif name in self.field_defaults:
+                val = self.field_defaults[name]
+                if callable(val):
+                    val = val()
+            else:
+                raise TypeError("{0} is missing argument '{1}'".format(self.__class__.__name__, name))
+            object.__setattr__(self, name, val)
+
+        if kwargs:
+            raise TypeError("{0} got unexpected arguments {1}".format(self.__class__.__name__, sorted(kwargs)))
+
+    def __reduce__(self):
+        return (self.__class__, tuple(getattr(self, name) for name in self.field_names))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, str(key))
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, val):
+        try:
+            setattr(self, str(key), val)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.field_names
+
+    def __iter__(self):
+        return iter(self.field_names)
+
+    def __len__(self):
+        return len(self.field_names)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(getattr(self, name) == getattr(other, name) for name in self.field_names)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{0}({1})".format(self.__class__.__name__, ", ".join("{0}={1!r}".format(name, getattr(self, name)) for name in self.field_names))
+
+    def keys(self):
+        return list(self.field_names)
+
+    def values(self):
+        return [getattr(self, name) for name in self.field_names]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.field_names]
+
+    def get(self, key, dflt=None):
+        if key in self.field_names:
+            return getattr(self, key)
+        return dflt
+
     def clone(self):
         """Return a clone of this object"""
-        return self.__class__(**dict((name, self[name]) for name in self.fields))
+        return self.__class__(**dict(self.items()))
 
     def as_dict(self, **kwargs):
         """Return as a deeply nested dictionary"""
-        result = {}
-        for field in self.fields:
-            if isinstance(field, (list, tuple)):
-                field, _ = field
-            val = self[field]
-            if hasattr(val, "as_dict"):
-                result[field] = val.as_dict(**kwargs)
-            else:
-                result[field] = val
-        return result
+        return unpack(self, kwargs, walk_root=True)
+
+########################
+###   UNPACKING
+########################
+
+# The events made by walk
+KEY = "key"
+VALUE = "value"
+START_MAPPING = "start_mapping"
+START_SEQUENCE = "start_sequence"
+END = "end"
+
+leaf_types = frozenset([type(None), bool, float] + list(six.integer_types) + list(six.string_types))
+
+# Whether each class is walked through it's fields, see walks_fields
+walked_classes = {}
+
+def walks_fields(kls):
+    """Say whether instances of kls are walked through their fields rather than by calling their as_dict"""
+    walks = walked_classes.get(kls)
+    if walks is None:
+        walks = False
+        for parent in kls.__mro__:
+            if "as_dict" in parent.__dict__:
+                walks = parent in (dictobj, recordobj)
+                break
+        walked_classes[kls] = walks
+    return walks
+
+def field_items(obj):
+    """Return [(name, value)] for the fields of this dictobj or recordobj"""
+    if isinstance(obj, recordobj):
+        return obj.items()
+    names = [field[0] if isinstance(field, (list, tuple)) else field for field in obj.fields or []]
+    return [(name, obj[name]) for name in names]
+
+def mapping_items(items, sort_keys=False, skipkeys=False):
+    """Return the (key, value) items of a mapping in the order they are walked, see walk"""
+    if skipkeys:
+        items = [(key, val) for key, val in items if isinstance(key, six.string_types) or key.__class__ in leaf_types]
+    if sort_keys:
+        items = sorted(items, key=lambda item: item[0])
+    return items
+
+def walk(val, kwargs, walk_root=False, sort_keys=False, skipkeys=False):
+    """
+    Yield (event, value) for val without recursing
+
+    dictobjs and recordobjs are walked through their fields unless their class
+    has it's own as_dict, in which case that is called with kwargs and the
+    result is a VALUE. Dictionaries, lists and tuples (but not subclasses of
+    them) are walked into unless they only hold strings, numbers and None.
+
+    Walking into something yields START_MAPPING or START_SEQUENCE with the
+    class of the thing, then the events for what is inside it, then END.
+    Everything inside a mapping is preceded by a KEY.
+
+    walk_root says to walk val through it's fields even if it's class has it's
+    own as_dict. sort_keys and skipkeys do what they do for json.JSONEncoder
+    for the mappings that are walked into.
+    """
+    active = set()
+    stack = [(False, iter([(None, val)]), None)]
+    while stack:
+        mapping, items, ident = stack[-1]
+        try:
+            key, val = next(items)
+        except StopIteration:
+            stack.pop()
+            if stack:
+                active.discard(ident)
+                yield END, None
+            continue
+
+        if mapping:
+            yield KEY, key
+
+        kls = val.__class__
+        if kls in leaf_types:
+            yield VALUE, val
+            continue
+
+        if isinstance(val, (dictobj, recordobj)) and (walk_root or walks_fields(kls)):
+            event, children = START_MAPPING, mapping_items(field_items(val), sort_keys, skipkeys)
+        elif hasattr(val, "as_dict"):
+            yield VALUE, val.as_dict(**kwargs)
+            continue
+        elif kls is dict and not leaf_types.issuperset(map(type, val.values())):
+            event, children = START_MAPPING, mapping_items(list(val.items()), sort_keys, skipkeys)
+        elif (kls is list or kls is tuple) and not leaf_types.issuperset(map(type, val)):
+            event, children = START_SEQUENCE, [(None, item) for item in val]
+        else:
+            yield VALUE, val
+            continue
+
+        walk_root = False
+        ident = id(val)
+        if ident in active:
+            raise ValueError("Circular reference detected")
+        active.add(ident)
+        yield event, kls
+        stack.append((event is START_MAPPING, iter(children), ident))
+
+def unpack(val, kwargs=None, walk_root=False):
+    """
+    Return val with any dictobjs and recordobjs inside it turned into dictionaries
+
+    This is what as_dict uses, and kwargs are given to the as_dict of any
+    class that has it's own. Dictionaries, lists and tuples that are walked
+    into are copied, see walk.
+    """
+    result = None
+    stack = []
+    for event, value in walk(val, kwargs or {}, walk_root=walk_root):
+        if event is KEY:
+            stack[-1][1] = value
+            continue
+        elif event is START_MAPPING:
+            stack.append([{}, None, False])
+            continue
+        elif event is START_SEQUENCE:
+            stack.append([[], None, value is tuple])
+            continue
+        elif event is END:
+            value, _, is_tuple = stack.pop()
+            if is_tuple:
+                value = tuple(value)
+
+        if not stack:
+            result = value
+        elif isinstance(stack[-1][0], list):
+            stack[-1][0].append(value)
+        else:
+            stack[-1][0][stack[-1][1]] = value
+    return result
+
+def json_key(key, encoder):
+    """Return this key as a JSON string, converting it like json does"""
+    if not isinstance(key, six.string_types):
+        if key.__class__ not in leaf_types:
+            raise TypeError("keys must be str, int, float, bool or None, not {0}".format(key.__class__.__name__))
+        key = encoder.encode(key)
+    return encoder.encode(key)
+
+def iter_json(val, encoder=None, **kwargs):
+    """
+    Yield val as chunks of JSON without making the dictionary as_dict would
+
+    Values that aren't walked into (see walk) are encoded with the encoder,
+    which defaults to json.JSONEncoder(). The separators, sort_keys and
+    skipkeys of the encoder are used for everything. It's other options, like
+    ensure_ascii and default, apply to the keys and values it encodes, and it's
+    indent is only used for the values it encodes.
+
+    kwargs are given to the as_dict of any class that has it's own.
+    """
+    if encoder is None:
+        encoder = json.JSONEncoder()
+
+    item_separator = encoder.item_separator
+    key_separator = encoder.key_separator
+
+    # [closing bracket, is the next thing the first in the container]
+    stack = []
+    for event, value in walk(val, kwargs, sort_keys=encoder.sort_keys, skipkeys=encoder.skipkeys):
+        if event is KEY:
+            if not stack[-1][1]:
+                yield item_separator
+            stack[-1][1] = False
+            yield json_key(value, encoder)
+            yield key_separator
+            continue
+
+        if event is END:
+            yield stack.pop()[0]
+            continue
+
+        if stack and stack[-1][0] == "]":
+            if not stack[-1][1]:
+                yield item_separator
+            stack[-1][1] = False
+
+        if event is START_MAPPING:
+            stack.append(["}", True])
+            yield "{"
+        elif event is START_SEQUENCE:
+            stack.append(["]", True])
+            yield "["
+        else:
+            for chunk in encoder.iterencode(value):
+                yield chunk
 
+def dump_json(val, fle, encoder=None, **kwargs):
+    """Write val as JSON to a file like object, see iter_json"""
+    for chunk in iter_json(val, encoder=encoder, **kwargs):
+        fle.write(chunk)
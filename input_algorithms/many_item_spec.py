@@ -31,6 +31,11 @@ class many_item_formatted_spec(Spec):
     seperators = ":"
     optional_specs = []
 
+    @property
+    def reads_everything(self):
+        """We only look at meta.everything if we have a formatter"""
+        return bool(getattr(self, "formatter", None))
+
     def setup(self, *args, **kwargs):
         """Setup our value_name if not already specified on the class"""
         if not self.value_name:
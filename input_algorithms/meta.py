@@ -1,17 +1,88 @@
 import six
 
+# Rendered path strings shared between metas when Meta.intern_paths is True
+interned_paths = {}
+interned_paths_limit = 10000
+
+def join_path(prefix, parts):
+    """Join parts onto the prefix path string"""
+    complete = [prefix] if prefix else []
+    for part in parts:
+        if isinstance(part, six.string_types):
+            name, extra = part, ""
+        else:
+            name, extra = part
+
+        if name and complete:
+            complete.append(".")
+        if name or extra:
+            complete.append("{0}{1}".format(name, extra))
+    return "".join(complete)
+
+def join_nonspecial_path(prefix, parts):
+    """Join the names in parts onto the prefix path string"""
+    names = [prefix] if prefix else []
+    names.extend(part for part, _ in parts if part)
+    return ".".join(names)
+
 class Meta(object):
-    """Holds information about some value"""
+    """
+    Holds information about some value
+
+    Each meta made by new_path only holds the parts it adds to the path and a
+    reference to the meta it was made from. The full path is only put together
+    when it's asked for.
+
+    The path strings are remembered once made. If intern_paths is True, they are
+    also shared with other metas that have the same path, so that documents with
+    the same shape only render each path once.
+    """
     everything = None
+    fail_fast = False
+    intern_paths = False
     format_options = None
 
-    def __init__(self, everything, path, format_options=None):
-        self._path = path
-        if isinstance(self._path, six.string_types):
-            self._path = [(self._path, "")]
+    _path_string = None
+    _nonspecial_path_string = None
+
+    def __init__(self, everything, path, format_options=None, fail_fast=False):
+        self._parent = None
+        self._parts = path
+        if isinstance(self._parts, six.string_types):
+            self._parts = [(self._parts, "")]
 
         self.everything = everything
         self.format_options = format_options
+        if fail_fast:
+            self.fail_fast = True
+
+    @property
+    def _path(self):
+        """Return the list of (name, extra) parts from the root meta to here"""
+        if self._parent is None:
+            return self._parts
+
+        path = []
+        for parts in self.parts_from_root():
+            path.extend(parts)
+        return path
+
+    @_path.setter
+    def _path(self, path):
+        self._parent = None
+        self._parts = path
+        self._path_string = None
+        self._nonspecial_path_string = None
+
+    def parts_from_root(self):
+        """Return the parts of each meta from the root meta to this one"""
+        chain = []
+        meta = self
+        while meta is not None:
+            chain.append(meta._parts)
+            meta = meta._parent
+        chain.reverse()
+        return chain
 
     def indexed_at(self, index):
         return self.new_path([("", "[{0}]".format(index))])
@@ -21,32 +92,61 @@ class Meta(object):
 
     def new_path(self, part):
         """Return a new instance of this class with additional path part"""
-        return self.__class__(self.everything, self._path + part)
+        new = self.__class__(self.everything, part)
+        new._parent = self
+        if self.fail_fast:
+            new.fail_fast = True
+        return new
+
+    def with_fail_fast(self):
+        """
+        Return a copy of this meta that makes container specs stop at the first error
+
+        Instead of collecting every error into one parent error, they will raise
+        the first error they come across as is.
+        """
+        new = self.__class__(self.everything, self._parts, format_options=self.format_options)
+        new._parent = self._parent
+        new.fail_fast = True
+        return new
 
     def key_names(self):
         """Return {_key_name_<i>: <i'th part of part} for each part in the path reversed"""
         return dict(("_key_name_{0}".format(index), val) for index, (val, _) in enumerate(reversed(self._path)))
 
+    def joined(self, joiner, prefix):
+        """Use joiner to add our parts to prefix, sharing the result if we intern paths"""
+        if not self.intern_paths:
+            return joiner(prefix, self._parts)
+
+        try:
+            key = (joiner, prefix, tuple(self._parts))
+            joined = interned_paths.get(key)
+            if joined is None:
+                if len(interned_paths) >= interned_paths_limit:
+                    interned_paths.clear()
+                # Another thread may clear the table at any time so don't look it up again
+                joined = interned_paths.setdefault(key, joiner(prefix, self._parts))
+            return joined
+        except TypeError:
+            # Some part of the path isn't hashable
+            return joiner(prefix, self._parts)
+
     @property
     def path(self):
         """Return the path as a string"""
-        complete = []
-        for part in self._path:
-            if isinstance(part, six.string_types):
-                name, extra = part, ""
-            else:
-                name, extra = part
-
-            if name and complete:
-                complete.append(".")
-            if name or extra:
-                complete.append("{0}{1}".format(name, extra))
-        return "".join(complete)
+        if self._path_string is None:
+            prefix = "" if self._parent is None else self._parent.path
+            self._path_string = self.joined(join_path, prefix)
+        return self._path_string
 
     @property
     def nonspecial_path(self):
         """Return the path as a string without extra strings"""
-        return ".".join(part for part, _ in self._path if part)
+        if self._nonspecial_path_string is None:
+            prefix = "" if self._parent is None else self._parent.nonspecial_path
+            self._nonspecial_path_string = self.joined(join_nonspecial_path, prefix)
+        return self._nonspecial_path_string
 
     @property
     def source(self):
@@ -65,4 +165,3 @@ class Meta(object):
             return "{{path={0}}}".format(self.path)
         else:
             return "{{source={0}, path={1}}}".format(self.source, self.path)
-
@@ -0,0 +1,215 @@
+"""
+Find out where time goes when normalising
+
+Use profiling as a context manager::
+
+    with profiling() as profiler:
+        spec.normalise(meta, val)
+
+    profiler.by_class()
+    profiler.by_path()
+    pstats.Stats(profiler).sort_stats("tottime").print_stats()
+    open("stacks.txt", "w").write(profiler.collapsed())
+
+While inside, the normalise method of Spec and every subclass that defines its
+own normalise is replaced with one that records how long it took. The original
+methods are put back when the last profiler finishes, so normalising outside
+the context isn't any slower. Profilers may overlap and each records the calls
+made while it is active.
+
+Functions made by Spec.compile don't call normalise on the specs inside them
+and so only the spec that was compiled is seen.
+"""
+from input_algorithms.spec_base import Spec
+
+from collections import defaultdict
+import threading
+import marshal
+import time
+
+timer = getattr(time, "perf_counter", time.time)
+
+# The profilers currently recording and the normalise methods we replaced
+active = ()
+replaced = []
+replacing = threading.Lock()
+
+def spec_classes(kls=Spec):
+    """Yield kls and all it's subclasses"""
+    found = set()
+    todo = [kls]
+    while todo:
+        kls = todo.pop()
+        if kls not in found:
+            found.add(kls)
+            todo.extend(kls.__subclasses__())
+            yield kls
+
+def wrap(original):
+    """Return a normalise that gives calls to original to the active profilers"""
+    def normalise(spec, meta, val):
+        return record_calls(active, original, spec, meta, val)
+    normalise.__doc__ = original.__doc__
+    return normalise
+
+def record_calls(profilers, original, spec, meta, val):
+    """Call original with each of these profilers recording the call"""
+    if not profilers:
+        return original(spec, meta, val)
+    call = lambda spec, meta, val: record_calls(profilers[1:], original, spec, meta, val)
+    return profilers[0].call(call, spec, meta, val)
+
+def start(profiler):
+    """Add this profiler to the active ones, replacing normalise methods if it's the first"""
+    global active
+    with replacing:
+        if not active:
+            for kls in spec_classes():
+                if "normalise" in kls.__dict__:
+                    original = kls.__dict__["normalise"]
+                    replaced.append((kls, original))
+                    setattr(kls, "normalise", wrap(original))
+        active = active + (profiler, )
+
+def stop(profiler):
+    """Remove this profiler from the active ones, putting back normalise methods if it's the last"""
+    global active
+    with replacing:
+        active = tuple(other for other in active if other is not profiler)
+        if not active:
+            while replaced:
+                kls, original = replaced.pop()
+                setattr(kls, "normalise", original)
+
+def path_for(meta):
+    """Return the nonspecial path of this meta, or None if it doesn't have one"""
+    try:
+        return meta.nonspecial_path
+    except Exception:
+        return None
+
+class Timing(object):
+    """Calls made and time taken by something"""
+    def __init__(self):
+        self.calls = 0
+        self.primitive_calls = 0
+        self.inclusive = 0
+        self.exclusive = 0
+        self.callers = defaultdict(lambda: [0, 0, 0, 0])
+
+    def as_dict(self):
+        """Return our calls, inclusive and exclusive time as a dictionary"""
+        return {"calls": self.calls, "inclusive": self.inclusive, "exclusive": self.exclusive}
+
+class Frame(object):
+    """A call to normalise that hasn't finished yet"""
+    def __init__(self, spec, key, path, start):
+        self.key = key
+        self.spec = spec
+        self.path = path
+        self.start = start
+        self.children = 0
+
+class profiling(object):
+    """
+    Record calls and time taken by Spec.normalise, by spec class and by path
+
+    inclusive times include the time taken by the specs inside, exclusive times
+    don't. A spec class normalising inside itself only counts the outermost
+    call towards the inclusive time, like cProfile does.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.classes = defaultdict(Timing)
+        self.paths = defaultdict(Timing)
+        self.stacks = defaultdict(float)
+
+    def __enter__(self):
+        start(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stop(self)
+
+    @property
+    def stack(self):
+        """The calls to normalise in progress in this thread"""
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def call(self, original, spec, meta, val):
+        """Call original and record how long it took"""
+        stack = self.stack
+        if stack and stack[-1].spec is spec:
+            # A subclass calling the normalise on it's parent
+            return original(spec, meta, val)
+
+        kls = spec.__class__
+        frame = Frame(spec, (kls.__module__, 0, kls.__name__), path_for(meta), timer())
+        stack.append(frame)
+        try:
+            return original(spec, meta, val)
+        finally:
+            took = timer() - frame.start
+            stack.pop()
+            if stack:
+                stack[-1].children += took
+            self.record(frame, took, stack)
+
+    def record(self, frame, took, stack):
+        """Record a finished call"""
+        exclusive = took - frame.children
+        outermost = not any(parent.key == frame.key for parent in stack)
+        path_outermost = not any(parent.path == frame.path for parent in stack)
+        names = ";".join([parent.key[2] for parent in stack] + [frame.key[2]])
+
+        with self.lock:
+            timing = self.classes[frame.key]
+            timing.calls += 1
+            timing.exclusive += exclusive
+            if outermost:
+                timing.primitive_calls += 1
+                timing.inclusive += took
+
+            if stack:
+                called = timing.callers[stack[-1].key]
+                called[1] += 1
+                called[2] += exclusive
+                if outermost:
+                    called[0] += 1
+                    called[3] += took
+
+            timing = self.paths[frame.path]
+            timing.calls += 1
+            timing.exclusive += exclusive
+            if path_outermost:
+                timing.inclusive += took
+
+            self.stacks[names] += exclusive
+
+    def by_class(self):
+        """Return {class name: {"calls", "inclusive", "exclusive"}}"""
+        return dict((key[2], timing.as_dict()) for key, timing in self.classes.items())
+
+    def by_path(self):
+        """Return {nonspecial path: {"calls", "inclusive", "exclusive"}}"""
+        return dict((path, timing.as_dict()) for path, timing in self.paths.items())
+
+    def create_stats(self):
+        """Fill out self.stats in the format pstats.Stats wants"""
+        self.stats = {}
+        for key, timing in self.classes.items():
+            callers = dict((caller, tuple(called)) for caller, called in timing.callers.items())
+            self.stats[key] = (timing.primitive_calls, timing.calls, timing.exclusive, timing.inclusive, callers)
+
+    def dump_stats(self, filename):
+        """Write the stats to a file that pstats can load"""
+        self.create_stats()
+        with open(filename, "wb") as fle:
+            marshal.dump(self.stats, fle)
+
+    def collapsed(self):
+        """Return the exclusive microseconds of each stack of spec classes as collapsed stacks for flamegraph.pl"""
+        return "".join("{0} {1}\n".format(names, int(round(seconds * 1e6))) for names, seconds in sorted(self.stacks.items()))
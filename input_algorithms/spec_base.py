@@ -1,23 +1,54 @@
-from input_algorithms.errors import BadSpec, BadSpecValue, BadDirectory, BadFilename
+from input_algorithms.errors import BadSpec, BadSpecValue, BadDirectory, BadFilename, ProgrammerError
+from input_algorithms.caching import LRU
 
-import operator
+import functools
+import types
 import six
+import sys
 import os
 
+try:
+    from collections.abc import Iterator
+except ImportError:
+    from collections import Iterator
+
+# Set by input_algorithms.tracing when a tracer is installed
+tracer = None
+
 class NotSpecified(object):
     """Tell the difference between None and not specified"""
 
     def __repr__(self):
         return "<NotSpecified>"
 
+def numpy_array(val):
+    """
+    Return val if it's a one dimensional numpy array, otherwise None
+
+    We only look for numpy if it's already been imported, an array can't exist
+    without it.
+    """
+    numpy = sys.modules.get("numpy")
+    if numpy is not None and isinstance(val, numpy.ndarray) and val.ndim == 1:
+        return val
+
+def failing_fast(meta):
+    """Say whether this meta wants us to raise the first error we find"""
+    return getattr(meta, "fail_fast", False) is True
+
 def apply_validators(meta, val, validators, chain_value=True):
     errors = []
+    fail_fast = failing_fast(meta)
     for validator in validators:
         try:
             nxt = validator.normalise(meta, val)
             if chain_value:
                 val = nxt
         except BadSpecValue as e:
+            if tracer is not None:
+                tracer.validator_failed(validator, meta, e)
+            if fail_fast:
+                raise
             errors.append(e)
 
     if errors:
@@ -25,45 +56,590 @@ def apply_validators(meta, val, validators, chain_value=True):
 
     return val
 
-class Spec(object):
-    def __init__(self, *pargs, **kwargs):
-        self.pargs = pargs
-        self.kwargs = kwargs
-        if hasattr(self, "setup"):
-            self.setup(*pargs, **kwargs)
+def children_failed(spec, meta, errors):
+    """Return the error for the errors from the children of a container spec, telling the tracer about them"""
+    if tracer is not None:
+        tracer.children_failed(spec, meta, errors)
+    return BadSpecValue(meta=meta, _errors=errors)
+
+def defined_by(kls, name):
+    """Return the class in the mro of kls that defines name"""
+    for parent in kls.__mro__:
+        if name in parent.__dict__:
+            return parent
+
+# Attributes that specs keep their child specs in
+child_attributes = ("spec", "specs", "optional_specs", "options", "name_spec", "value_spec", "validators", "expected_spec", "fallback")
+
+def child_specs(spec):
+    """Yield the specs directly inside this spec"""
+    for attr in child_attributes:
+        found = getattr(spec, attr, None)
+        if isinstance(found, dict):
+            found = list(found.values())
+        if not isinstance(found, (list, tuple)):
+            found = [found]
+
+        for child in found:
+            if isinstance(child, (list, tuple)):
+                for thing in child:
+                    if isinstance(thing, Spec):
+                        yield thing
+            elif isinstance(child, Spec):
+                yield child
+
+# The methods that decide what a spec normalises values into
+normalise_hooks = ("normalise", "normalise_either", "normalise_filled")
+
+# And the method validators use as well
+validating_hooks = normalise_hooks + ("validate", )
+
+def describes_hooks(spec, name, hooks=normalise_hooks):
+    """
+    Say whether the class attribute name on spec can be trusted to describe it's hooks
+
+    That is when name is defined by a class that also defines or inherits each
+    of the hooks and none of the hooks are set on the spec itself, so subclasses
+    that change how they normalise don't inherit a wrong answer.
+    """
+    kls = spec.__class__
+    owner = defined_by(kls, name)
+    for hook in hooks:
+        if hook in spec.__dict__:
+            return False
+
+        hook_owner = defined_by(kls, hook)
+        if hook_owner is not None and not issubclass(owner, hook_owner):
+            return False
+
+    return True
+
+def is_cacheable(spec, with_filesystem=False):
+    """
+    Say whether this spec and all it's children are cacheable
+
+    Specs that touch the filesystem are only cacheable if with_filesystem is True.
+    cacheable is only trusted in the same way as accepts, see accepted_types.
+    """
+    if not isinstance(spec, Spec) or not spec.cacheable or not describes_hooks(spec, "cacheable", validating_hooks):
+        return False
+    if spec.touches_filesystem and not with_filesystem:
+        return False
+    return all(is_cacheable(child, with_filesystem) for child in child_specs(spec))
+
+def reads_everything(spec, seen=None):
+    """
+    Say whether this spec or any of it's children look at meta.everything
+
+    Specs are assumed to look at it unless reads_everything is False and
+    trusted in the same way as accepts, see accepted_types.
+    """
+    if not isinstance(spec, Spec):
+        return False
+    if spec.reads_everything or not describes_hooks(spec, "reads_everything", validating_hooks):
+        return True
+
+    seen = set() if seen is None else seen
+    seen.add(id(spec))
+    return any(reads_everything(child, seen) for child in child_specs(spec) if id(child) not in seen)
+
+def accepted_types(spec):
+    """
+    Return the types of filled values spec may successfully normalise, or None if it may accept anything
+
+    accepts is only trusted if it's defined by a class that also defines or
+    inherits how the spec normalises filled values, so subclasses that change
+    what they accept don't inherit a wrong answer.
+    """
+    if not isinstance(spec, Spec) or spec.accepts is None or not describes_hooks(spec, "accepts"):
+        return None
+    return spec.accepts
+
+def unchanged(previous, val):
+    """Say whether val is the same as previous, treating values that can't be compared as changed"""
+    if previous is val:
+        return True
+    if type(previous) is not type(val):
+        return False
+
+    try:
+        return bool(previous == val)
+    except Exception:
+        return False
+
+def renormalises_filled(spec, kls):
+    """Say whether spec normalises filled values with kls.normalise_filled and nothing else"""
+    return defined_by(spec.__class__, "normalise_filled") is kls and "normalise_filled" not in spec.__dict__ and not hasattr(spec, "normalise_either")
+
+def renormalise_item(spec, meta, previous, results, key, name, val):
+    """Renormalise val with the result for name if previous had key, otherwise normalise it"""
+    if isinstance(spec, Spec) and key in previous and name in results:
+        return spec.renormalise(meta, previous[key], results[name], val)
+    return spec.normalise(meta, val)
+
+def reused(result, new):
+    """Return result if new is a dictionary with the same values, otherwise new"""
+    if len(result) == len(new) and all(name in result and result[name] is value for name, value in new.items()):
+        return result
+    return new
+
+def compile_spec(spec):
+    """Compile spec if it's one of ours, otherwise use it's normalise method"""
+    if isinstance(spec, Spec):
+        return spec.compile()
+    return spec.normalise
+
+def normalise_items(spec, meta, items, normalise_item):
+    """
+    Return [normalise_item(meta, key, item) for key, item in items]
+
+    Errors are collected into one error for meta (see children_failed) unless
+    the meta is failing fast. This is the loop used by the container specs
+    whether they are compiled or not.
+    """
+    result = []
+    errors = []
+    fail_fast = failing_fast(meta)
+    for key, item in items:
+        try:
+            result.append(normalise_item(meta, key, item))
+        except BadSpec as error:
+            if fail_fast:
+                raise
+            errors.append(error)
+
+    if errors:
+        raise children_failed(spec, meta, errors)
+
+    return result
+
+# The everything given to share_everything in this process
+shared_everything = None
+
+class SharedEverything(object):
+    """Stands in for meta.everything when it's been given to share_everything"""
+
+def share_everything(everything):
+    """
+    Remember everything for the metas made in executor workers
+
+    Use this as the initializer of an executor given to listof or dictof, and
+    call it in the parent process with the same everything, so that specs
+    reading meta.everything don't need it sent with every chunk::
+
+        share_everything(everything)
+        executor = ProcessPoolExecutor(initializer=share_everything, initargs=(everything, ))
+    """
+    global shared_everything
+    shared_everything = everything
+
+def describe_meta(spec, meta):
+    """
+    Return what rebuild_meta needs to make meta again in an executor worker
+
+    That is the class and path of the meta, and meta.everything only if the spec
+    reads it, because everything is usually the whole document.
+    """
+    everything = None
+    if reads_everything(spec):
+        everything = meta.everything
+        if everything is not None and everything is shared_everything:
+            everything = SharedEverything
+    return (meta.__class__, list(meta._path), meta.format_options, failing_fast(meta), everything)
+
+def rebuild_meta(description):
+    """Return a meta from what describe_meta gave us"""
+    kls, path, format_options, fail_fast, everything = description
+    if everything is SharedEverything:
+        everything = shared_everything
+    return kls(everything, path, format_options=format_options, fail_fast=fail_fast)
+
+def restore_everything(error, everything):
+    """Give the metas in an error from an executor worker our everything if they don't have it"""
+    todo = [error]
+    while todo:
+        error = todo.pop()
+        meta = getattr(error, "kwargs", {}).get("meta")
+        if meta is not None and getattr(meta, "everything", False) is None:
+            while meta is not None:
+                meta.everything = everything
+                meta = getattr(meta, "_parent", None)
+        todo.extend(getattr(error, "errors", []))
+
+def normalise_chunk(spec, description, items):
+    """
+    Return [(True, result) or (False, error)] for each (key, item) in items
+
+    Uses spec.normalise_item(meta, key, item) with the meta from rebuild_meta
+    and stops at the first error if the meta is failing fast. This runs in the
+    executor used by listof and dictof.
+    """
+    meta = rebuild_meta(description)
+    results = []
+    fail_fast = failing_fast(meta)
+    for key, item in items:
+        try:
+            results.append((True, spec.normalise_item(meta, key, item)))
+        except BadSpec as error:
+            results.append((False, error))
+            if fail_fast:
+                break
+    return results
+
+def normalise_with_executor(executor, chunksize, spec, meta, items):
+    """
+    Normalise (key, item) pairs in chunks with executor.submit and normalise_chunk
+
+    Only the path of the meta is sent to the executor, along with meta.everything
+    if the spec reads it, see describe_meta. Results are returned and errors are
+    raised in the same order as items.
+    """
+    description = describe_meta(spec, meta)
+
+    futures = []
+    for start in range(0, len(items), chunksize):
+        futures.append(executor.submit(normalise_chunk, spec, description, items[start:start + chunksize]))
+
+    result = []
+    errors = []
+    fail_fast = failing_fast(meta)
+    for index, future in enumerate(futures):
+        for ok, value in future.result():
+            if ok:
+                result.append(value)
+                continue
+
+            restore_everything(value, meta.everything)
+            if fail_fast:
+                for left in futures[index + 1:]:
+                    left.cancel()
+                raise value
+            errors.append(value)
+
+    if errors:
+        raise children_failed(spec, meta, errors)
+
+    return result
+
+class ChoiceIndex(object):
+    """
+    Answers whether a value is one of the choices with a set for the hashable choices
+
+    Unhashable choices and values are looked for in the choices one at a time.
+    Choices that aren't a list or tuple, like strings, use their own in.
+    """
+    def __init__(self, choices):
+        self.choices = choices
+        self.hashed = None
+        self.size = None
+        self.unhashable = []
+
+        if isinstance(choices, (list, tuple)):
+            self.size = len(choices)
+            self.hashed = set()
+            for choice in choices:
+                try:
+                    self.hashed.add(choice)
+                except TypeError:
+                    self.unhashable.append(choice)
+
+    def __contains__(self, val):
+        if self.hashed is None:
+            return val in self.choices
+
+        try:
+            if val in self.hashed:
+                return True
+        except TypeError:
+            return val in self.choices
+
+        return val in self.unhashable
+
+def choice_index(spec):
+    """
+    Return a ChoiceIndex for spec.choices, made again if choices is replaced or changes size
+
+    Replacing a choice in place without adding or removing any isn't noticed.
+    """
+    index = getattr(spec, "indexed_choices", None)
+    if index is None or index.choices is not spec.choices or (index.size is not None and index.size != len(spec.choices)):
+        index = spec.indexed_choices = ChoiceIndex(spec.choices)
+    return index
+
+class CompiledValidator(object):
+    """Something with a normalise method for apply_validators from a compiled spec"""
+    def __init__(self, spec):
+        self.spec = spec
+        self.normalise = compile_spec(spec)
+
+# The optional methods a spec may have that decide what normalise and fake_filled do
+dispatch_hooks = ("normalise_either", "normalise_empty", "default", "normalise_filled", "fake")
+made_dispatchers = {}
+
+def dispatchers_for(hooks):
+    """Return (normalise, fake_filled) functions for a spec that has these hooks"""
+    hooks = frozenset(hooks)
+    if hooks in made_dispatchers:
+        return made_dispatchers[hooks]
+
+    has_either = "normalise_either" in hooks
+    has_empty = "normalise_empty" in hooks
+    has_default = "default" in hooks
+    has_filled = "normalise_filled" in hooks
+    has_fake = "fake" in hooks
 
     def normalise(self, meta, val):
-        """Use this spec to normalise our value"""
-        if hasattr(self, "normalise_either"):
+        if has_either:
             result = self.normalise_either(meta, val)
             if result is not NotSpecified:
                 return result
 
         if val is NotSpecified:
-            if hasattr(self, "normalise_empty"):
+            if has_empty:
                 return self.normalise_empty(meta)
-            elif hasattr(self, "default"):
+            elif has_default:
+                if tracer is not None:
+                    tracer.default_used(self, meta)
                 return self.default(meta)
             else:
                 return val
-        elif hasattr(self, "normalise_filled"):
+        elif has_filled:
             return self.normalise_filled(meta, val)
 
         raise BadSpec("Spec doesn't know how to deal with this value", spec=self, meta=meta, val=val)
 
     def fake_filled(self, meta, with_non_defaulted=False):
-        """Return this spec as if it was filled with the defaults"""
-        if hasattr(self, "fake"):
+        if has_fake:
             return self.fake(meta, with_non_defaulted=with_non_defaulted)
-        if hasattr(self, "default"):
+        if has_default:
             return self.default(meta)
         return NotSpecified
 
+    made_dispatchers[hooks] = (normalise, fake_filled)
+    return made_dispatchers[hooks]
+
+def set_class_dispatch(kls):
+    """Work out the dispatch functions for this class and all it's subclasses"""
+    normalise, fake_filled = dispatchers_for(hook for hook in dispatch_hooks if hasattr(kls, hook))
+    type.__setattr__(kls, "dispatch_normalise", normalise)
+    type.__setattr__(kls, "dispatch_fake_filled", fake_filled)
+    for subclass in kls.__subclasses__():
+        set_class_dispatch(subclass)
+
+class SpecMeta(type):
+    """Metaclass that resolves which hooks a Spec class has when it's defined"""
+    def __init__(kls, name, bases, attrs):
+        super(SpecMeta, kls).__init__(name, bases, attrs)
+        set_class_dispatch(kls)
+
+    def __setattr__(kls, key, val):
+        super(SpecMeta, kls).__setattr__(key, val)
+        if key in dispatch_hooks:
+            set_class_dispatch(kls)
+
+    def __delattr__(kls, key):
+        super(SpecMeta, kls).__delattr__(key)
+        if key in dispatch_hooks:
+            set_class_dispatch(kls)
+
+@six.add_metaclass(SpecMeta)
+class Spec(object):
+    # Whether normalising with this spec may block on the filesystem
+    touches_filesystem = False
+
+    # Whether the result of normalising a value only depends on the value
+    # (and the filesystem if touches_filesystem) and may be shared between
+    # every time that value is normalised, see is_cacheable
+    cacheable = False
+
+    # Whether normalising with this spec looks at meta.everything
+    reads_everything = False
+
+    # The types of filled values this spec may successfully normalise
+    # None means it may accept any value, see accepted_types
+    accepts = None
+
+    def __init__(self, *pargs, **kwargs):
+        self.pargs = pargs
+        self.kwargs = kwargs
+        if hasattr(self, "setup"):
+            self.setup(*pargs, **kwargs)
+
+    def __setattr__(self, key, val):
+        object.__setattr__(self, key, val)
+        if key in dispatch_hooks:
+            self.set_instance_dispatch()
+
+    def __delattr__(self, key):
+        object.__delattr__(self, key)
+        if key in dispatch_hooks:
+            self.set_instance_dispatch()
+
+    def __getstate__(self):
+        """Leave out dispatch functions when pickled, they are made again when unpickled"""
+        state = dict(self.__dict__)
+        state.pop("dispatch_normalise", None)
+        state.pop("dispatch_fake_filled", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if any(hook in state for hook in dispatch_hooks):
+            self.set_instance_dispatch()
+
+    def set_instance_dispatch(self):
+        """Work out our dispatch functions when hooks are set on this instance"""
+        normalise, fake_filled = dispatchers_for(hook for hook in dispatch_hooks if hasattr(self, hook))
+        object.__setattr__(self, "dispatch_normalise", types.MethodType(normalise, self))
+        object.__setattr__(self, "dispatch_fake_filled", types.MethodType(fake_filled, self))
+
+    def normalise(self, meta, val):
+        """
+        Use this spec to normalise our value
+
+        Which of normalise_either, normalise_empty, default and normalise_filled
+        get used is worked out when the class is made, see dispatchers_for.
+        """
+        if tracer is not None:
+            return tracer.normalise(self, meta, val)
+        return self.dispatch_normalise(meta, val)
+
+    def anormalise(self, meta, val):
+        """
+        Return a coroutine that normalises our value without blocking the event loop
+
+        See input_algorithms.aio, which needs python3.5 or above.
+        """
+        from input_algorithms import aio
+        return aio.anormalise(self, meta, val)
+
+    def normalise_many(self, meta, values):
+        """
+        Normalise each of values as if they were at meta.indexed_at(<index>)
+
+        Errors from the values are collected into one error for meta.
+
+        Subclasses may override this to check and convert all the values in one
+        go, which listof uses when it has no expect.
+        """
+        if numpy_array(values) is not None:
+            values = values.tolist()
+
+        result = []
+        errors = []
+        fail_fast = failing_fast(meta)
+        normalise = self.normalise
+        for index, val in enumerate(values):
+            try:
+                result.append(normalise(meta.indexed_at(index), val))
+            except BadSpec as error:
+                if fail_fast:
+                    raise
+                errors.append(error)
+
+        if errors:
+            raise BadSpecValue(meta=meta, _errors=errors)
+
+        return result
+
+    def renormalise(self, meta, previous, result, val):
+        """
+        Normalise val knowing that previous normalised into result
+
+        If val is unchanged from previous, then result is given back as is unless
+        this spec looks at meta.everything, which may have changed. Otherwise
+        renormalise_changed is used.
+
+        Values are compared with ==.
+        """
+        if unchanged(previous, val) and not reads_everything(self):
+            return result
+        return self.renormalise_changed(meta, previous, result, val)
+
+    def renormalise_changed(self, meta, previous, result, val):
+        """
+        Normalise val when it has changed from previous
+
+        Container specs override this to only renormalise the parts that changed.
+        """
+        return self.normalise(meta, val)
+
+    def compiled_hook(self, name):
+        """
+        Return self.<name> or the function made by compile_<name>
+
+        compile_<name> is only used if it's defined on the same class as <name>
+        so that subclasses overriding <name> still get their own behaviour.
+        """
+        if name in self.__dict__:
+            return self.__dict__[name]
+
+        owner = defined_by(self.__class__, name)
+        if owner is None:
+            return None
+
+        compiler = owner.__dict__.get("compile_{0}".format(name))
+        if compiler is not None:
+            return compiler(self)
+        return getattr(self, name)
+
+    def compile(self):
+        """
+        Return a function taking (meta, val) that does what self.normalise does
+
+        The hooks on this spec are looked up once here instead of on every call
+        and child specs are compiled as well where the spec knows about them.
+
+        The result doesn't notice changes made to the spec after compiling.
+        """
+        if defined_by(self.__class__, "normalise") is not Spec:
+            return self.normalise
+
+        either = self.compiled_hook("normalise_either")
+        filled = self.compiled_hook("normalise_filled")
+
+        empty = None
+        if hasattr(self, "normalise_empty"):
+            empty = self.normalise_empty
+        elif hasattr(self, "default"):
+            empty = self.default
+
+        spec = self
+        def normalise_rest(meta, val):
+            if val is NotSpecified:
+                if empty is None:
+                    return val
+                return empty(meta)
+            elif filled is not None:
+                return filled(meta, val)
+
+            raise BadSpec("Spec doesn't know how to deal with this value", spec=spec, meta=meta, val=val)
+
+        if either is None:
+            return normalise_rest
+
+        def normalise(meta, val):
+            result = either(meta, val)
+            if result is not NotSpecified:
+                return result
+            return normalise_rest(meta, val)
+        return normalise
+
+    def fake_filled(self, meta, with_non_defaulted=False):
+        """Return this spec as if it was filled with the defaults"""
+        return self.dispatch_fake_filled(meta, with_non_defaulted=with_non_defaulted)
+
 class pass_through_spec(Spec):
+    cacheable = True
+    reads_everything = False
+
     def normalise_either(self, meta, val):
         return val
 
 class always_same_spec(Spec):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, result):
         self.result = result
 
@@ -71,6 +647,10 @@ class always_same_spec(Spec):
         return self.result
 
 class dictionary_spec(Spec):
+    reads_everything = False
+
+    accepts = (dict, )
+
     def default(self, meta):
         return {}
 
@@ -82,76 +662,225 @@ class dictionary_spec(Spec):
         return val
 
 class dictof(dictionary_spec):
-    def setup(self, name_spec, value_spec, nested=False):
+    """
+    Normalise the names and values of a dictionary
+
+    If an executor (like a concurrent.futures.ProcessPoolExecutor) is given, then
+    dictionaries with more than chunksize items are normalised in chunks with
+    that executor.
+
+    Only the path of the meta is sent to the executor, and meta.everything as
+    well if the spec reads it (see share_everything).
+    """
+
+    reads_everything = False
+
+    def setup(self, name_spec, value_spec, nested=False, executor=None, chunksize=1000):
         self.nested = nested
         self.name_spec = name_spec
         self.value_spec = value_spec
+        self.executor = executor
+        self.chunksize = chunksize
+
+    def __getstate__(self):
+        """Executors can't be pickled and we don't want them used in other processes anyway"""
+        state = super(dictof, self).__getstate__()
+        state["executor"] = None
+        state["kwargs"] = dict((key, val) for key, val in self.kwargs.items() if key != "executor")
+        return state
+
+    def nested_spec(self):
+        """Return the spec for nested dictionaries"""
+        return self.__class__(self.name_spec, self.value_spec, nested=self.nested)
+
+    def normalise_nested(self, meta, val):
+        """Normalise a nested dictionary"""
+        return self.nested_spec().normalise(meta, val)
+
+    def normalise_item(self, meta, key, value):
+        """Return (name, normalised) for this key and value"""
+        return self.normalise_item_with(self.name_spec.normalise, self.value_spec.normalise, self.normalise_nested, meta, key, value)
+
+    def normalise_item_with(self, name_normalise, value_normalise, nested_normalise, meta, key, value):
+        """Return (name, normalised) for this key and value using these normalisers"""
+        name = name_normalise(meta.at(key), key)
+        if self.nested and isinstance(value, dict):
+            return name, nested_normalise(meta.at(key), value)
+        return name, value_normalise(meta.at(key), value)
 
     def normalise_filled(self, meta, val):
         """Make sure all the names match the spec and normalise the values"""
+        return self.normalise_filled_with(self.name_spec.normalise, self.value_spec.normalise, self.normalise_nested, meta, val)
+
+    def normalise_filled_with(self, name_normalise, value_normalise, nested_normalise, meta, val):
+        """normalise_filled using these normalisers for names, values and nested dictionaries"""
         val = super(dictof, self).normalise_filled(meta, val)
 
-        result = {}
-        errors = []
-        for key, value in val.items():
-            try:
-                name = self.name_spec.normalise(meta.at(key), key)
-            except BadSpec as error:
-                errors.append(error)
-            else:
-                try:
-                    if self.nested and isinstance(value, dict):
-                        normalised = self.__class__(self.name_spec, self.value_spec, nested=self.nested).normalise(meta.at(key), value)
-                    else:
-                        normalised = self.value_spec.normalise(meta.at(key), value)
-                except BadSpec as error:
-                    errors.append(error)
-                else:
-                    result[name] = normalised
+        if self.executor is not None and len(val) > self.chunksize:
+            return dict(normalise_with_executor(self.executor, self.chunksize, self, meta, list(val.items())))
 
-        if errors:
-            raise BadSpecValue(meta=meta, _errors=errors)
+        normalise_item = functools.partial(self.normalise_item_with, name_normalise, value_normalise, nested_normalise)
+        return dict(normalise_items(self, meta, val.items(), normalise_item))
 
-        return result
+    def renormalise_changed(self, meta, previous, result, val):
+        """Renormalise only the values that changed"""
+        if not all(isinstance(thing, dict) for thing in (previous, result, val)) or not renormalises_filled(self, dictof):
+            return self.normalise(meta, val)
+
+        def renormalise(meta, key, value):
+            name = self.name_spec.normalise(meta.at(key), key)
+            value_spec = self.nested_spec() if self.nested and isinstance(value, dict) else self.value_spec
+            return name, renormalise_item(value_spec, meta.at(key), previous, result, key, name, value)
+
+        return reused(result, dict(normalise_items(self, meta, val.items(), renormalise)))
+
+    def compile_normalise_filled(self):
+        """Return a normalise_filled with our name_spec and value_spec compiled"""
+        if self.executor is not None:
+            return self.normalise_filled
+
+        # Compiled lazily because it will have it's own nested spec to compile
+        nested_compiled = []
+        def nested_normalise(meta, val):
+            if not nested_compiled:
+                nested_compiled.append(self.nested_spec().compile())
+            return nested_compiled[0](meta, val)
+
+        return functools.partial(self.normalise_filled_with, compile_spec(self.name_spec), compile_spec(self.value_spec), nested_normalise)
 
 class listof(Spec):
-    def setup(self, spec, expect=NotSpecified):
+    """
+    Normalise each item in a list
+
+    If an executor (like a concurrent.futures.ProcessPoolExecutor) is given, then
+    lists with more than chunksize items are normalised in chunks with that
+    executor.
+
+    Only the path of the meta is sent to the executor, and meta.everything as
+    well if the spec reads it (see share_everything).
+    """
+
+    reads_everything = False
+
+    def setup(self, spec, expect=NotSpecified, executor=None, chunksize=1000):
         self.spec = spec
         self.expect = expect
+        self.executor = executor
+        self.chunksize = chunksize
+
+    def __getstate__(self):
+        """Executors can't be pickled and we don't want them used in other processes anyway"""
+        state = super(listof, self).__getstate__()
+        state["executor"] = None
+        state["kwargs"] = dict((key, val) for key, val in self.kwargs.items() if key != "executor")
+        return state
 
     def default(self, meta):
         return []
 
+    def normalise_item(self, meta, index, item):
+        """Normalise one item from the list"""
+        return self.normalise_item_with(self.spec.normalise, meta, index, item)
+
+    def normalise_item_with(self, normalise, meta, index, item):
+        """Normalise one item from the list using this normaliser for our spec"""
+        if isinstance(item, self.expect):
+            return item
+
+        value = normalise(meta.indexed_at(index), item)
+        if self.expect is not NotSpecified and not isinstance(value, self.expect):
+            raise BadSpecValue("Expected normaliser to create a specific object", expected=self.expect, meta=meta.indexed_at(index), got=value)
+        return value
+
     def normalise_filled(self, meta, val):
         """Turn this into a list of it's not and normalise all the items in the list"""
+        normalise_many = None
+        if self.expect is NotSpecified and isinstance(self.spec, Spec):
+            normalise_many = self.spec.normalise_many
+        return self.normalise_filled_with(self.spec.normalise, normalise_many, meta, val)
+
+    def normalise_filled_with(self, normalise, normalise_many, meta, val):
+        """normalise_filled using this normaliser for our spec, or normalise_many for all the items if it's given"""
         if self.expect is not NotSpecified and isinstance(val, self.expect):
             return [val]
 
-        if not isinstance(val, list):
+        if not isinstance(val, list) and numpy_array(val) is None:
             val = [val]
 
-        result = []
-        errors = []
-        for index, item in enumerate(val):
-            if isinstance(item, self.expect):
-                result.append((index, item))
-            else:
-                try:
-                    result.append((index, self.spec.normalise(meta.indexed_at(index), item)))
-                except BadSpec as error:
-                    errors.append(error)
+        if self.executor is not None and len(val) > self.chunksize:
+            return normalise_with_executor(self.executor, self.chunksize, self, meta, list(enumerate(val)))
+
+        if normalise_many is not None:
+            try:
+                return normalise_many(meta, val)
+            except BadSpecValue as error:
+                if tracer is not None and error.kwargs.get("meta") is meta:
+                    tracer.children_failed(self, meta, error.errors)
+                raise
 
-        if self.expect is not NotSpecified:
-            for index, value in result:
-                if not isinstance(value, self.expect):
-                    errors.append(BadSpecValue("Expected normaliser to create a specific object", expected=self.expect, meta=meta.indexed_at(index), got=value))
+        return normalise_items(self, meta, enumerate(val), functools.partial(self.normalise_item_with, normalise))
 
-        if errors:
-            raise BadSpecValue(meta=meta, _errors=errors)
+    def compile_normalise_filled(self):
+        """Return a normalise_filled with our spec compiled"""
+        if self.executor is not None:
+            return self.normalise_filled
+
+        normalise_many = None
+        if self.expect is NotSpecified and isinstance(self.spec, Spec) and defined_by(self.spec.__class__, "normalise_many") is not Spec:
+            normalise_many = self.spec.normalise_many
+
+        return functools.partial(self.normalise_filled_with, compile_spec(self.spec), normalise_many)
 
-        return list(map(operator.itemgetter(1), result))
+class streamed_listof(Spec):
+    """
+    Like listof, but lazily normalises items from a list or any iterator
+
+    The result is a generator that normalises each item as it's asked for, so
+    the input doesn't need to be in memory all at once.
+
+    By default the first bad item raises an error for us when it's reached. With
+    collect_errors=True the good items are still yielded and the errors are
+    raised together once the input is exhausted.
+    """
+
+    reads_everything = False
+
+    def setup(self, spec, collect_errors=False):
+        self.spec = spec
+        self.collect_errors = collect_errors
+
+    def default(self, meta):
+        return iter(())
+
+    def normalise_filled(self, meta, val):
+        """Return a generator of the normalised items"""
+        if not isinstance(val, list) and not isinstance(val, Iterator):
+            val = [val]
+        return self.stream(meta, val)
+
+    def stream(self, meta, items):
+        """Yield each item normalised with our spec"""
+        errors = []
+        fail_fast = failing_fast(meta)
+        normalise = self.spec.normalise
+        for index, item in enumerate(items):
+            try:
+                yield normalise(meta.indexed_at(index), item)
+            except BadSpec as error:
+                if fail_fast:
+                    raise
+                if not self.collect_errors:
+                    raise BadSpecValue(meta=meta, _errors=[error])
+                errors.append(error)
+
+        if errors:
+            raise children_failed(self, meta, errors)
 
 class set_options(Spec):
+    reads_everything = False
+
+    accepts = (dict, )
+
     def setup(self, **options):
         self.options = options
 
@@ -160,25 +889,32 @@ class set_options(Spec):
 
     def normalise_filled(self, meta, val):
         """Fill out a dictionary with what we want as well as the remaining extra"""
+        return self.normalise_filled_with([(key, spec.normalise) for key, spec in self.options.items()], meta, val)
+
+    def normalise_filled_with(self, normalisers, meta, val):
+        """normalise_filled using these (key, normalise) for our options"""
         if not isinstance(val, dict):
             raise BadSpecValue("Expected a dictionary", meta=meta, got=type(val))
 
-        result = {}
-        errors = []
+        def normalise_option(meta, key, normalise):
+            return key, normalise(meta.at(key), val.get(key, NotSpecified))
 
-        for key, spec in self.options.items():
-            nxt = val.get(key, NotSpecified)
+        return dict(normalise_items(self, meta, normalisers, normalise_option))
 
-            try:
-                normalised = spec.normalise(meta.at(key), nxt)
-                result[key] = normalised
-            except (BadSpec, BadSpecValue) as error:
-                errors.append(error)
+    def renormalise_changed(self, meta, previous, result, val):
+        """Renormalise only the options that changed"""
+        if not all(isinstance(thing, dict) for thing in (previous, result, val)) or not renormalises_filled(self, set_options):
+            return self.normalise(meta, val)
 
-        if errors:
-            raise BadSpecValue(meta=meta, _errors=errors)
+        def renormalise(meta, key, spec):
+            return key, renormalise_item(spec, meta.at(key), previous, result, key, key, val.get(key, NotSpecified))
 
-        return result
+        return reused(result, dict(normalise_items(self, meta, self.options.items(), renormalise)))
+
+    def compile_normalise_filled(self):
+        """Return a normalise_filled with all our options compiled"""
+        normalisers = [(key, compile_spec(spec)) for key, spec in self.options.items()]
+        return functools.partial(self.normalise_filled_with, normalisers)
 
     def fake(self, meta, with_non_defaulted=False):
         """Return a dict with the defaults from the keys that have them"""
@@ -190,15 +926,34 @@ class set_options(Spec):
         return result
 
 class defaulted(Spec):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, spec, dflt):
         self.spec = spec
-        self.default = lambda m: dflt
+        self.dflt = dflt
+
+    def default(self, meta):
+        return self.dflt
 
     def normalise_filled(self, meta, val):
         """Proxy our spec"""
         return self.spec.normalise(meta, val)
 
+    def compile_normalise_filled(self):
+        """Our spec compiled"""
+        return compile_spec(self.spec)
+
+    def renormalise_changed(self, meta, previous, result, val):
+        """Renormalise our spec for filled values"""
+        if val is NotSpecified or not isinstance(self.spec, Spec) or not renormalises_filled(self, defaulted):
+            return self.normalise(meta, val)
+        return self.spec.renormalise_changed(meta, previous, result, val)
+
 class required(Spec):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, spec):
         self.spec = spec
 
@@ -210,10 +965,85 @@ class required(Spec):
         """Proxy our spec"""
         return self.spec.normalise(meta, val)
 
+    def compile_normalise_filled(self):
+        """Our spec compiled"""
+        return compile_spec(self.spec)
+
+    def fake(self, meta, with_non_defaulted=False):
+        return self.spec.fake_filled(meta, with_non_defaulted=with_non_defaulted)
+
+    def renormalise_changed(self, meta, previous, result, val):
+        """Renormalise our spec for filled values"""
+        if val is NotSpecified or not isinstance(self.spec, Spec) or not renormalises_filled(self, required):
+            return self.normalise(meta, val)
+        return self.spec.renormalise_changed(meta, previous, result, val)
+
+class fail_fast_spec(Spec):
+    """Normalise our spec so that it raises the first error it finds"""
+
+    reads_everything = False
+
+    def setup(self, spec):
+        self.spec = spec
+
+    def fake(self, meta, with_non_defaulted=False):
+        return self.spec.fake_filled(meta, with_non_defaulted=with_non_defaulted)
+
+    def normalise(self, meta, val):
+        """Proxy our spec with a fail fast meta"""
+        if not failing_fast(meta):
+            meta = meta.with_fail_fast()
+        return self.spec.normalise(meta, val)
+
+class memoised(Spec):
+    """
+    Remember what our spec normalises hashable values into
+
+    Results are kept in an LRU of at most maxsize entries and only successful
+    results are remembered. Only cacheable specs may be memoised, and those that
+    look at the filesystem need a ttl in seconds.
+    """
+
+    reads_everything = False
+
+    def setup(self, spec, maxsize=1024, ttl=None):
+        if not is_cacheable(spec, with_filesystem=ttl is not None):
+            raise ProgrammerError("Can only memoise cacheable specs, and those touching the filesystem need a ttl, got {0}".format(spec.__class__.__name__))
+
+        self.spec = spec
+        self.cache = LRU(maxsize=maxsize, ttl=ttl)
+
     def fake(self, meta, with_non_defaulted=False):
         return self.spec.fake_filled(meta, with_non_defaulted=with_non_defaulted)
 
+    def stats(self):
+        """Return the hits and misses of our cache"""
+        return self.cache.stats()
+
+    def normalise(self, meta, val):
+        """Return what we remember for this val or normalise it with our spec"""
+        if val is NotSpecified:
+            return self.spec.normalise(meta, val)
+
+        # Include the type so that 1, 1.0 and True are remembered separately
+        key = (type(val), val)
+        try:
+            result = self.cache.get(key, self.cache)
+        except TypeError:
+            # Unhashable values can't be remembered
+            return self.spec.normalise(meta, val)
+
+        if result is self.cache:
+            result = self.spec.normalise(meta, val)
+            self.cache.set(key, result)
+        return result
+
 class boolean(Spec):
+    accepts = (bool, )
+
+    cacheable = True
+    reads_everything = False
+
     def normalise_filled(self, meta, val):
         """Complain if not already a boolean"""
         if not isinstance(val, bool):
@@ -222,6 +1052,11 @@ class boolean(Spec):
             return val
 
 class directory_spec(Spec):
+    touches_filesystem = True
+
+    cacheable = True
+    reads_everything = False
+
     def setup(self, spec=NotSpecified):
         self.spec = spec
         if self.spec is NotSpecified:
@@ -245,6 +1080,13 @@ class directory_spec(Spec):
             return val
 
 class filename_spec(Spec):
+    touches_filesystem = True
+
+    cacheable = True
+    reads_everything = False
+
+    accepts = six.string_types
+
     def setup(self, may_not_exist=False):
         self.may_not_exist = may_not_exist
 
@@ -265,6 +1107,8 @@ class filename_spec(Spec):
         return val
 
 class file_spec(Spec):
+    reads_everything = False
+
     def normalise_filled(self, meta, val):
         """Complain if not a file object"""
         bad = False
@@ -281,6 +1125,11 @@ class file_spec(Spec):
         return val
 
 class string_spec(Spec):
+    accepts = six.string_types
+
+    cacheable = True
+    reads_everything = False
+
     def default(self, meta):
         return ""
 
@@ -292,13 +1141,33 @@ class string_spec(Spec):
         return val
 
 class integer_spec(Spec):
+    cacheable = True
+    reads_everything = False
+
     def normalise_filled(self, meta, val):
         """Make sure it's an integer and convert into one if it's a string"""
         if not isinstance(val, bool) and (isinstance(val, int) or hasattr(val, "isdigit") and val.isdigit()):
             return int(val)
         raise BadSpecValue("Expected an integer", meta=meta, got=type(val))
 
+    def normalise_many(self, meta, values):
+        """Return integer arrays and lists of only ints without looking at each value"""
+        if not normalises_plainly(self, integer_spec):
+            return super(integer_spec, self).normalise_many(meta, values)
+
+        array = numpy_array(values)
+        if array is not None:
+            if array.dtype.kind in "iu":
+                return array.tolist()
+        elif all(type(val) is int for val in values):
+            return list(values)
+
+        return super(integer_spec, self).normalise_many(meta, values)
+
 class float_spec(Spec):
+    cacheable = True
+    reads_everything = False
+
     def normalise_filled(self, meta, val):
         """Make sure it's a float"""
         try:
@@ -309,7 +1178,26 @@ class float_spec(Spec):
         except (TypeError, ValueError) as error:
             raise BadSpecValue("Expected a float", meta=meta, got=type(val), error=error)
 
+    def normalise_many(self, meta, values):
+        """Convert numeric arrays in one go and lists of only ints and floats without checking each value"""
+        if not normalises_plainly(self, float_spec):
+            return super(float_spec, self).normalise_many(meta, values)
+
+        array = numpy_array(values)
+        if array is not None:
+            if array.dtype.kind in "iuf":
+                return array.astype(float).tolist()
+        elif set(map(type, values)) <= set([int, float]):
+            return [float(val) for val in values]
+
+        return super(float_spec, self).normalise_many(meta, values)
+
 class string_or_int_as_string_spec(Spec):
+    cacheable = True
+    reads_everything = False
+
+    accepts = six.string_types + six.integer_types
+
     def default(self, meta):
         return ""
 
@@ -320,15 +1208,72 @@ class string_or_int_as_string_spec(Spec):
         return str(val)
 
 class valid_string_spec(string_spec):
-    def setup(self, *validators):
+    """
+    Make sure we have a string that passes all the validators
+
+    If combined=True is given, then the validators from input_algorithms.validators
+    that look at the characters of the string or match it against regexes are
+    combined into one regex (see validators.combined_regex). The validators are
+    only run one at a time if that regex doesn't match, so we still complain
+    about exactly which ones failed.
+    """
+    accepts = six.string_types
+
+    cacheable = True
+    reads_everything = False
+
+    def setup(self, *validators, **kwargs):
         self.validators = validators
+        self.combined = kwargs.get("combined", False)
+        self.combined_validators = None
+
+    def combined_check(self):
+        """Return (regex, others) for our validators if we are combining them, otherwise None"""
+        if not self.combined:
+            return None
+
+        if self.combined_validators is not self.validators:
+            from input_algorithms.validators import combined_regex
+            self.combination = combined_regex(self.validators)
+            self.combined_validators = self.validators
+
+        if self.combination[0] is None:
+            return None
+        return self.combination
 
     def normalise_filled(self, meta, val):
         """Make sure if there is a value, that it is valid"""
         val = super(valid_string_spec, self).normalise_filled(meta, val)
+
+        check = self.combined_check()
+        if check is not None and check[0].match(val):
+            return apply_validators(meta, val, check[1])
         return apply_validators(meta, val, self.validators)
 
+    def compile_normalise_filled(self):
+        """Return a normalise_filled with our validators compiled"""
+        check_string = super(valid_string_spec, self).normalise_filled
+        validators = [CompiledValidator(validator) for validator in self.validators]
+
+        check = self.combined_check()
+        if check is None:
+            regex, others = None, None
+        else:
+            regex, others = check[0], [CompiledValidator(validator) for validator in check[1]]
+
+        def normalise_filled(meta, val):
+            val = check_string(meta, val)
+            if regex is not None and regex.match(val):
+                return apply_validators(meta, val, others)
+            return apply_validators(meta, val, validators)
+        return normalise_filled
+
 class string_choice_spec(string_spec):
+    accepts = six.string_types
+
+    cacheable = True
+    reads_everything = False
+
     def setup(self, choices, reason=NotSpecified):
         self.choices = choices
         self.reason = reason
@@ -339,12 +1284,14 @@ class string_choice_spec(string_spec):
         """Complain if val isn't one of the available"""
         val = super(string_choice_spec, self).normalise_filled(meta, val)
 
-        if val not in self.choices:
+        if val not in choice_index(self):
             raise BadSpecValue(self.reason, available=self.choices, got=val, meta=meta)
 
         return val
 
 class create_spec(Spec):
+    reads_everything = False
+
     def setup(self, kls, *validators, **expected):
         self.kls = kls
         self.expected = expected
@@ -370,48 +1317,234 @@ class create_spec(Spec):
             result[key] = values.get(key, NotSpecified)
         return self.kls(**result)
 
+    def renormalise_changed(self, meta, previous, result, val):
+        """
+        Give back result if none of the expected values changed, otherwise normalise val again
+
+        The values on result have already been through kls and may have been
+        changed by it, so they can't be used to make a new kls.
+        """
+        if not isinstance(previous, dict) or not isinstance(val, dict) or isinstance(val, self.kls) or not isinstance(result, self.kls) or not renormalises_filled(self, create_spec):
+            return self.normalise(meta, val)
+
+        try:
+            previous_values = dict((key, getattr(result, key)) for key in self.expected)
+        except AttributeError:
+            return self.normalise(meta, val)
+
+        apply_validators(meta, val, self.validators, chain_value=False)
+        values = self.expected_spec.renormalise_changed(meta, previous, previous_values, val)
+        if values is previous_values:
+            return result
+
+        values = self.expected_spec.normalise(meta, val)
+        result = getattr(meta, 'base', {})
+        for key in self.expected:
+            result[key] = None
+            result[key] = values.get(key, NotSpecified)
+        return self.kls(**result)
+
+    def compile_normalise_filled(self):
+        """Return a normalise_filled with our validators and expected_spec compiled"""
+        kls = self.kls
+        expected = list(self.expected)
+        validators = [CompiledValidator(validator) for validator in self.validators]
+        expected_normalise = compile_spec(self.expected_spec)
+
+        def normalise_filled(meta, val):
+            if isinstance(val, kls):
+                return val
+
+            apply_validators(meta, val, validators, chain_value=False)
+            values = expected_normalise(meta, val)
+            result = getattr(meta, 'base', {})
+            for key in expected:
+                result[key] = None
+                result[key] = values.get(key, NotSpecified)
+            return kls(**result)
+        return normalise_filled
+
 class or_spec(Spec):
-    def setup(self, *specs):
-        self.specs = specs
+    """
+    Use the first of our specs that successfully normalises the value
 
-    def normalise_filled(self, meta, val):
-        """Try all the specs till one doesn't raise a BadSpec"""
-        errors = []
-        for spec in self.specs:
+    Specs that can't accept the type of the value (see accepted_types) aren't
+    tried. If none of the specs succeed, the skipped specs are tried as well so
+    we complain with an error from every spec.
+
+    If exclusive=True is given, we are told that at most one of the specs can
+    succeed for any value, and so specs are tried in the order that they last
+    succeeded for each type instead of the order they were given in.
+    """
+    cacheable = True
+    reads_everything = False
+
+    def setup(self, *specs, **kwargs):
+        self.specs = specs
+        self.exclusive = kwargs.get("exclusive", False)
+        self.candidates = {}
+
+    def candidates_for(self, typ):
+        """Return the indexes of the specs that may accept values of this type, remembered per type"""
+        specs, found = self.candidates.get(typ, (None, None))
+        if specs is not self.specs:
+            found = []
+            for index, spec in enumerate(self.specs):
+                types = accepted_types(spec)
+                if types is None or issubclass(typ, types):
+                    found.append(index)
+            found = tuple(found)
+            self.candidates[typ] = (self.specs, found)
+        return found
+
+    def succeeded(self, typ, index, candidates):
+        """Try this spec first for this type next time if we are exclusive"""
+        if self.exclusive and candidates[0] != index:
+            self.candidates[typ] = (self.specs, (index, ) + tuple(found for found in candidates if found != index))
+
+    def normalise_with(self, normalisers, meta, val):
+        """Return the result from the first of the normalisers that succeeds"""
+        typ = type(val)
+        candidates = self.candidates_for(typ)
+
+        errors = {}
+        for index in candidates:
             try:
-                return spec.normalise(meta, val)
+                result = normalisers[index](meta, val)
             except BadSpec as error:
-                errors.append(error)
+                errors[index] = error
+            else:
+                self.succeeded(typ, index, candidates)
+                return result
+
+        # Try the ones we skipped so we have an error from each spec
+        for index, normalise in enumerate(normalisers):
+            if index not in errors:
+                try:
+                    return normalise(meta, val)
+                except BadSpec as error:
+                    errors[index] = error
 
         # If made it this far, none of the specs passed :(
-        raise BadSpecValue("Value doesn't match any of the options", meta=meta, val=val, _errors=errors)
+        raise BadSpecValue("Value doesn't match any of the options", meta=meta, val=val, _errors=[errors[index] for index in range(len(normalisers))])
+
+    def normalise_filled(self, meta, val):
+        """Try the specs till one doesn't raise a BadSpec"""
+        return self.normalise_with([spec.normalise for spec in self.specs], meta, val)
+
+    def compile_normalise_filled(self):
+        """Return a normalise_filled with each of our specs compiled"""
+        normalisers = [compile_spec(spec) for spec in self.specs]
+        return lambda meta, val: self.normalise_with(normalisers, meta, val)
 
 class match_spec(Spec):
+    """
+    Use the spec paired with the first type that the value is an instance of
+
+    Which spec to use is worked out with isinstance the first time we see each
+    type of value and remembered after that.
+    """
+    cacheable = True
+    reads_everything = False
+
     def setup(self, *specs, **kwargs):
         self.specs = specs
         self.fallback = kwargs.get("fallback")
+        self.matched_specs = None
+
+    def matching(self, val):
+        """Return the index of the spec to use for this val, or None if none match"""
+        if self.matched_specs is not self.specs:
+            self.matched = {}
+            self.expected_types = [expected_typ for expected_typ, _ in self.specs]
+            self.matched_specs = self.specs
+
+        typ = type(val)
+        if typ not in self.matched:
+            found = None
+            for index, expected_typ in enumerate(self.expected_types):
+                if isinstance(val, expected_typ):
+                    found = index
+                    break
+            self.matched[typ] = found
+        return self.matched[typ]
+
+    def no_match(self, meta, val):
+        """Return the error for when none of the specs match"""
+        return BadSpecValue("Value doesn't match any of the options", meta=meta, got=type(val), expected=self.expected_types)
 
     def normalise_filled(self, meta, val):
         """Try the specs given the type of val"""
-        for expected_typ, spec in self.specs:
-            if isinstance(val, expected_typ):
-                return spec.normalise(meta, val)
+        index = self.matching(val)
+        if index is not None:
+            return self.specs[index][1].normalise(meta, val)
 
         if self.fallback is not None:
             return self.fallback.normalise(meta, val)
 
         # If made it this far, none of the specs matched
-        raise BadSpecValue("Value doesn't match any of the options", meta=meta, got=type(val), expected=[expected_typ for expected_typ, _ in self.specs])
+        raise self.no_match(meta, val)
+
+    def compile_normalise_filled(self):
+        """Return a normalise_filled with each of our specs compiled"""
+        normalisers = [compile_spec(spec) for _, spec in self.specs]
+        fallback = None if self.fallback is None else compile_spec(self.fallback)
+        matching = self.matching
+
+        def normalise_filled(meta, val):
+            index = matching(val)
+            if index is not None:
+                return normalisers[index](meta, val)
+
+            if fallback is not None:
+                return fallback(meta, val)
+
+            raise self.no_match(meta, val)
+        return normalise_filled
 
 class and_spec(Spec):
+    """
+    Put the value through each of our specs in turn
+
+    Nested and_specs and the required, defaulted and optional_spec around specs
+    are flattened into one list of specs that values go through. If any of them
+    fail, or something in the middle gives back NotSpecified, then we go through
+    the specs as given again so we can complain with all the transformations.
+    """
+    cacheable = True
+    reads_everything = False
+
     def setup(self, *specs):
         self.specs = specs
+        self.flattened_specs = None
+
+    def flattened(self):
+        """Return our specs with nested and_specs and wrappers flattened, remembered until specs changes"""
+        if self.flattened_specs is not self.specs:
+            self.flat = list(flatten_and_specs(self.specs))
+            self.flattened_specs = self.specs
+        return self.flat
+
+    def normalise_through(self, specs, chain, meta, val):
+        """Put val through the specs, or through chain (our specs by default) if something goes wrong"""
+        result = val
+        try:
+            for spec in specs:
+                result = spec.normalise(meta, result)
+                if result is NotSpecified:
+                    break
+            else:
+                return result
+        except BadSpec:
+            pass
 
-    def normalise_filled(self, meta, val):
-        """Try all the specs"""
+        return self.normalise_chain(self.specs if chain is None else chain, meta, val)
+
+    def normalise_chain(self, specs, meta, val):
+        """Put val through each spec, complaining with all the transformations if one fails"""
         errors = []
         transformations = [val]
-        for spec in self.specs:
+        for spec in specs:
             try:
                 val = spec.normalise(meta, val)
                 transformations.append(val)
@@ -424,7 +1557,20 @@ class and_spec(Spec):
         else:
             return val
 
+    def normalise_filled(self, meta, val):
+        """Try all the specs"""
+        return self.normalise_through(self.flattened(), None, meta, val)
+
+    def compile_normalise_filled(self):
+        """Return a normalise_filled with each of our specs compiled"""
+        specs = [CompiledValidator(spec) for spec in self.flattened()]
+        chain = [CompiledValidator(spec) for spec in self.specs]
+        return lambda meta, val: self.normalise_through(specs, chain, meta, val)
+
 class optional_spec(Spec):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, spec):
         self.spec = spec
 
@@ -439,6 +1585,16 @@ class optional_spec(Spec):
         """Proxy the spec"""
         return self.spec.normalise(meta, val)
 
+    def compile_normalise_filled(self):
+        """Our spec compiled"""
+        return compile_spec(self.spec)
+
+    def renormalise_changed(self, meta, previous, result, val):
+        """Renormalise our spec for filled values"""
+        if val is NotSpecified or not isinstance(self.spec, Spec) or not renormalises_filled(self, optional_spec):
+            return self.normalise(meta, val)
+        return self.spec.renormalise_changed(meta, previous, result, val)
+
 class dict_from_bool_spec(Spec):
     def setup(self, dict_maker, spec):
         self.spec = spec
@@ -457,7 +1613,42 @@ class dict_from_bool_spec(Spec):
             val = self.dict_maker(meta, val)
         return self.spec.normalise(meta, val)
 
+    def compile_normalise_filled(self):
+        """Return a normalise_filled with our spec compiled"""
+        dict_maker = self.dict_maker
+        normalise = compile_spec(self.spec)
+
+        def normalise_filled(meta, val):
+            if isinstance(val, bool):
+                val = dict_maker(meta, val)
+            return normalise(meta, val)
+        return normalise_filled
+
+def flatten_and_specs(specs):
+    """
+    Yield the specs that a filled value goes through with these specs
+
+    The spec inside required, defaulted and optional_spec is used instead of
+    them, and the specs inside and_specs are used instead of the and_spec.
+    """
+    wrappers = (required, defaulted, optional_spec)
+    for spec in specs:
+        while isinstance(spec, wrappers) and isinstance(spec.spec, Spec) and any(normalises_plainly(spec, kls) for kls in wrappers):
+            spec = spec.spec
+
+        if isinstance(spec, and_spec) and normalises_plainly(spec, and_spec):
+            for found in flatten_and_specs(spec.specs):
+                yield found
+        else:
+            yield spec
+
+def normalises_plainly(spec, kls):
+    """Say whether spec normalises filled values with nothing but kls.normalise_filled"""
+    return defined_by(spec.__class__, "normalise") is Spec and renormalises_filled(spec, kls)
+
 class formatted(Spec):
+    reads_everything = True
+
     def setup(self, spec, formatter, expected_type=NotSpecified):
         self.spec = spec
         self.formatter = formatter
@@ -491,6 +1682,8 @@ class formatted(Spec):
         return formatted
 
 class many_format(Spec):
+    reads_everything = True
+
     def setup(self, spec, formatter, expected_type=NotSpecified):
         self.spec = spec
         self.formatter = formatter
@@ -520,6 +1713,9 @@ class many_format(Spec):
         return formatted(string_spec(), formatter=self.formatter, expected_type=self.expected_type).normalise(meta, "{{{0}}}".format(val))
 
 class overridden(Spec):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, value):
         self.value = value
 
@@ -530,10 +1726,15 @@ class overridden(Spec):
         return self.value
 
 class any_spec(Spec):
+    cacheable = True
+    reads_everything = False
+
     def normalise(self, meta, val):
         return val
 
 class container_spec(Spec):
+    reads_everything = False
+
     def setup(self, kls, spec):
         self.kls = kls
         self.spec = spec
@@ -544,7 +1745,15 @@ class container_spec(Spec):
     def normalise_either(self, meta, val):
         return self.kls(self.spec.normalise(meta, val))
 
+    def compile_normalise_either(self):
+        """Return a normalise_either with our spec compiled"""
+        kls = self.kls
+        normalise = compile_spec(self.spec)
+        return lambda meta, val: kls(normalise(meta, val))
+
 class delayed(Spec):
+    reads_everything = False
+
     def setup(self, spec):
         self.spec = spec
 
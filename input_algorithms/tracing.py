@@ -0,0 +1,127 @@
+"""
+Tell a tracer about what happens while normalising
+
+Make a subclass of Tracer with the events you care about and install it::
+
+    class LogTracer(Tracer):
+        def leave(self, spec, path, seconds, error):
+            log.info("%s at %s took %s", spec.__class__.__name__, path, seconds)
+
+    with traced(LogTracer(), sample=100):
+        spec.normalise(meta, val)
+
+When no tracer is installed, Spec.normalise and the other places that trace
+only check that input_algorithms.spec_base.tracer is None.
+
+Only specs that normalise with Spec.normalise are entered and left, so specs
+that override normalise and functions made by Spec.compile aren't seen.
+"""
+from input_algorithms import spec_base
+
+import itertools
+import threading
+import time
+
+timer = getattr(time, "perf_counter", time.time)
+
+def path_for(meta):
+    """Return the path of this meta, or None if it doesn't have one"""
+    try:
+        return meta.path
+    except Exception:
+        return None
+
+class Tracer(object):
+    """The events a tracer may be told about, which all do nothing here"""
+    def enter(self, spec, path):
+        """spec is about to normalise the value at path"""
+
+    def leave(self, spec, path, seconds, error):
+        """spec finished with the value at path, error is None unless it raised one"""
+
+    def default_used(self, spec, path):
+        """spec used its default for the value at path"""
+
+    def validator_failed(self, validator, path, error):
+        """validator complained about the value at path"""
+
+    def children_failed(self, spec, path, errors):
+        """Values inside the value at path failed to normalise with the container spec"""
+
+class Tracing(object):
+    """
+    Decides which documents are traced and tells the tracer about them
+
+    Only one in every sample documents is traced, where a document is
+    everything normalised by an outermost call to Spec.normalise in a thread.
+    """
+    def __init__(self, tracer, sample=1):
+        self.tracer = tracer
+        self.sample = sample
+        self.local = threading.local()
+        self.documents = itertools.count()
+
+    def active(self):
+        """Say whether the document being normalised in this thread is being traced"""
+        if getattr(self.local, "depth", 0) == 0:
+            return self.sample == 1
+        return self.local.sampled
+
+    def normalise(self, spec, meta, val):
+        """Normalise with spec, telling the tracer if this document is being traced"""
+        local = self.local
+        depth = getattr(local, "depth", 0)
+        if depth == 0:
+            local.sampled = next(self.documents) % self.sample == 0
+
+        local.depth = depth + 1
+        try:
+            if not local.sampled:
+                return spec.dispatch_normalise(meta, val)
+
+            path = path_for(meta)
+            self.tracer.enter(spec, path)
+            start = timer()
+            try:
+                result = spec.dispatch_normalise(meta, val)
+            except Exception as error:
+                self.tracer.leave(spec, path, timer() - start, error)
+                raise
+            self.tracer.leave(spec, path, timer() - start, None)
+            return result
+        finally:
+            local.depth = depth
+
+    def default_used(self, spec, meta):
+        if self.active():
+            self.tracer.default_used(spec, path_for(meta))
+
+    def validator_failed(self, validator, meta, error):
+        if self.active():
+            self.tracer.validator_failed(validator, path_for(meta), error)
+
+    def children_failed(self, spec, meta, errors):
+        if self.active():
+            self.tracer.children_failed(spec, path_for(meta), errors)
+
+def install(tracer, sample=1):
+    """Start telling tracer about one in every sample documents"""
+    spec_base.tracer = Tracing(tracer, sample=sample)
+
+def uninstall():
+    """Stop tracing"""
+    spec_base.tracer = None
+
+class traced(object):
+    """Context manager that installs a tracer while inside and puts back the previous one after"""
+    def __init__(self, tracer, sample=1):
+        self.tracer = tracer
+        self.sample = sample
+
+    def __enter__(self):
+        self.previous = spec_base.tracer
+        install(self.tracer, sample=self.sample)
+        return self.tracer
+
+    def __exit__(self, exc_type, exc, tb):
+        spec_base.tracer = self.previous
@@ -1,8 +1,54 @@
 from input_algorithms.errors import BadSpecValue, DeprecatedKey
-from input_algorithms.spec_base import Spec, NotSpecified
+from input_algorithms.spec_base import Spec, NotSpecified, defined_by, choice_index
+from input_algorithms.caching import LRU
 
+import six
 import re
 
+# Regexes made by combined_regex, shared by everything using the same checks
+combined_regexes = LRU(maxsize=256)
+
+# The flags of a regex that doesn't set any itself
+default_flags = re.compile("").flags
+
+def combined_regex(validators):
+    """
+    Return (regex, others) where regex matches the strings that pass all the
+    validators that can be combined and others is the rest of the validators
+
+    Only the validators before the first one that can't be combined are
+    combined, because that one may change the value that the validators after
+    it see. regex is None if none of the validators can be combined.
+
+    Characters that mustn't be in the string become one negative lookahead, and
+    the patterns from regexed become a lookahead each, so the whole string is
+    checked by one call to match.
+    """
+    chars = []
+    patterns = []
+    others = []
+    for index, validator in enumerate(validators):
+        pieces = validator.combinable() if isinstance(validator, Validator) else None
+        if pieces is None:
+            others = list(validators[index:])
+            break
+        chars.extend(piece for piece in pieces[0] if piece not in chars)
+        patterns.extend(pieces[1])
+
+    if not chars and not patterns:
+        return None, list(validators)
+
+    key = (tuple(chars), tuple(patterns))
+    regex = combined_regexes.get(key, count=False)
+    if regex is None:
+        regex = ""
+        if chars:
+            regex = "(?![^{0}]*[{0}])".format("".join(chars))
+        regex = re.compile(regex + "".join("(?=(?:{0}))".format(pattern) for pattern in patterns))
+        combined_regexes.set(key, regex)
+
+    return regex, others
+
 class Validator(Spec):
     def normalise_either(self, meta, val):
         if val is NotSpecified:
@@ -10,7 +56,19 @@ class Validator(Spec):
         else:
             return self.validate(meta, val)
 
+    def combinable(self):
+        """
+        Return (characters, patterns) for combined_regex if we can be combined, otherwise None
+
+        characters are regex character class items that mustn't be in the value
+        and patterns are regexes that the value must match.
+        """
+        return None
+
 class has_either(Validator):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, choices):
         self.choices = choices
 
@@ -21,6 +79,9 @@ class has_either(Validator):
         return val
 
 class no_whitespace(Validator):
+    cacheable = True
+    reads_everything = False
+
     def setup(self):
         self.regex = re.compile("\s+")
 
@@ -30,7 +91,15 @@ class no_whitespace(Validator):
             raise BadSpecValue("Expected no whitespace", meta=meta, val=val)
         return val
 
+    def combinable(self):
+        """We don't want whitespace characters"""
+        if defined_by(self.__class__, "validate") is no_whitespace:
+            return ["\\s"], []
+
 class no_dots(Validator):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, reason=None):
         self.reason = reason
 
@@ -43,7 +112,15 @@ class no_dots(Validator):
             raise BadSpecValue(reason, meta=meta, val=val)
         return val
 
+    def combinable(self):
+        """We don't want dots"""
+        if defined_by(self.__class__, "validate") is no_dots:
+            return ["."], []
+
 class regexed(Validator):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, *regexes):
         self.regexes = [(regex, re.compile(regex)) for regex in regexes]
 
@@ -54,7 +131,31 @@ class regexed(Validator):
                 raise BadSpecValue("Expected value to match regex, it didn't", spec=spec, meta=meta, val=val)
         return val
 
+    def combinable(self):
+        """
+        Our patterns can be combined if they are strings without groups or flags
+        that work inside a lookahead
+
+        Some pythons apply flags like (?i) to the whole regex even when they are
+        inside a lookahead.
+        """
+        if defined_by(self.__class__, "validate") is not regexed:
+            return None
+
+        for spec, regex in self.regexes:
+            if not isinstance(spec, six.string_types) or regex.groups or regex.flags != default_flags:
+                return None
+            try:
+                re.compile("(?=(?:{0}))".format(spec))
+            except re.error:
+                return None
+
+        return [], [spec for spec, _ in self.regexes]
+
 class deprecated_key(Validator):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, key, reason):
         self.key = key
         self.reason = reason
@@ -65,12 +166,15 @@ class deprecated_key(Validator):
             raise DeprecatedKey(key=self.key, reason=self.reason, meta=meta)
 
 class choice(Validator):
+    cacheable = True
+    reads_everything = False
+
     def setup(self, *choices):
         self.choices = choices
 
     def validate(self, meta, val):
         """Complain if the key is not one of the correct choices"""
-        if val not in self.choices:
+        if val not in choice_index(self):
             raise BadSpecValue("Expected the value to be one of the valid choices", got=val, choices=self.choices, meta=meta)
         return val
 
@@ -0,0 +1,84 @@
+# coding: spec
+
+from unittest import SkipTest
+import sys
+
+if sys.version_info < (3, 5):
+    raise SkipTest("input_algorithms.aio needs python3.5 or above")
+
+from input_algorithms.errors import BadSpecValue, BadFilename, BadDirectory
+from input_algorithms import spec_base as sb
+from input_algorithms.meta import Meta
+from input_algorithms import aio
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from tests.helpers import TestCase
+
+import threading
+import asyncio
+import mock
+import os
+
+describe TestCase, "anormalise":
+    before_each:
+        self.meta = Meta({}, [])
+
+    def run_coroutine(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    it "knows which spec trees touch the filesystem":
+        assert not aio.touches_filesystem(sb.set_options(a=sb.listof(sb.string_spec())))
+        assert aio.touches_filesystem(sb.set_options(a=sb.listof(sb.filename_spec())))
+        assert aio.touches_filesystem(sb.match_spec((str, sb.directory_spec())))
+        assert not aio.touches_filesystem(mock.Mock(name="spec"))
+
+    it "normalises pure specs synchronously":
+        spec = sb.set_options(a=sb.integer_spec())
+        with mock.patch("asyncio.gather") as gather:
+            self.assertEqual(self.run_coroutine(spec.anormalise(self.meta, {"a": "1"})), {"a": 1})
+        self.assertEqual(gather.mock_calls, [])
+
+    it "checks the filesystem outside of the event loop thread":
+        threads = []
+        exists = os.path.exists
+        def record(path):
+            threads.append(threading.current_thread())
+            return exists(path)
+
+        with self.a_temp_file() as filename:
+            spec = sb.set_options(a=sb.filename_spec(), b=sb.integer_spec())
+            with mock.patch("os.path.exists", record):
+                self.assertEqual(self.run_coroutine(spec.anormalise(self.meta, {"a": filename, "b": 2})), {"a": filename, "b": 2})
+
+        self.assertEqual(len(threads), 1)
+        assert threads[0] is not threading.current_thread()
+
+    it "normalises children concurrently and collects their errors":
+        with self.a_temp_dir() as directory:
+            with self.a_temp_file() as filename:
+                spec = sb.set_options(
+                      files = sb.listof(sb.filename_spec())
+                    , dirs = sb.dictof(sb.string_spec(), sb.directory_spec())
+                    )
+
+                val = {"files": [filename, filename], "dirs": {"one": directory}}
+                self.assertEqual(self.run_coroutine(spec.anormalise(self.meta, val)), spec.normalise(self.meta, val))
+
+                val = {"files": [filename, directory], "dirs": {"one": filename}}
+                with self.assertRaises(BadSpecValue) as error:
+                    self.run_coroutine(spec.anormalise(self.meta, val))
+
+                paths = sorted(e.kwargs["meta"].path for child in error.exception.errors for e in child.errors)
+                self.assertEqual(paths, ["dirs.one", "files[1]"])
+
+    it "runs other specs with filesystem children in the executor":
+        with self.a_temp_file() as filename:
+            spec = sb.required(sb.filename_spec())
+            self.assertEqual(self.run_coroutine(spec.anormalise(self.meta, filename)), filename)
+
+            with self.assertRaises(BadFilename):
+                self.run_coroutine(spec.anormalise(self.meta, os.path.join(filename, "nope")))
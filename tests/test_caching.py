@@ -0,0 +1,149 @@
+# coding: spec
+
+from input_algorithms.caching import LRU, DocumentCache, fingerprint
+from input_algorithms.errors import BadSpecValue
+from input_algorithms import spec_base as sb
+from input_algorithms.meta import Meta
+from input_algorithms import caching
+
+from tests.helpers import TestCase
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+
+import pickle
+import mock
+
+describe TestCase, "LRU":
+    it "remembers values and counts hits and misses":
+        cache = LRU()
+        self.assertIs(cache.get("a"), None)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("b", 2), 2)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "size": 1, "maxsize": 1024})
+
+    it "doesn't count looking with in":
+        cache = LRU()
+        cache.set("a", None)
+        assert "a" in cache
+        assert "b" not in cache
+        self.assertEqual(cache.stats()["hits"], 0)
+        self.assertEqual(cache.stats()["misses"], 0)
+
+    it "forgets the least recently used first":
+        cache = LRU(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual(len(cache), 2)
+
+    it "forgets values after the ttl":
+        now = [10]
+        with mock.patch.object(caching, "timer", lambda: now[0]):
+            cache = LRU(ttl=5)
+            cache.set("a", 1)
+            self.assertEqual(cache.get("a"), 1)
+            now[0] = 15
+            self.assertIs(cache.get("a"), None)
+            assert "a" not in cache
+
+    it "can invalidate and clear":
+        cache = LRU()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.invalidate("a")
+        assert "a" not in cache
+        cache.clear()
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 0, "size": 0, "maxsize": 1024})
+
+    it "doesn't pickle it's entries":
+        cache = LRU(maxsize=3, ttl=4)
+        cache.set("a", 1)
+        loaded = pickle.loads(pickle.dumps(cache))
+        self.assertEqual((loaded.maxsize, loaded.ttl, len(loaded)), (3, 4, 0))
+
+describe TestCase, "fingerprint":
+    it "is the same for equal documents":
+        one = {"a": [1, 2.0, {"b": None}], "c": u"d", "e": True}
+        two = {"e": True, "c": u"d", "a": [1, 2.0, {"b": None}]}
+        self.assertEqual(fingerprint(one), fingerprint(two))
+
+    it "is different for different documents":
+        documents = [1, 1.0, True, "1", [1], (1, ), {1: 1}, [12, 3], [1, 23], {"a": "b"}, {"a": "c"}, None, int]
+        self.assertEqual(len(set(fingerprint(document) for document in documents)), len(documents))
+
+    it "can't fingerprint other objects":
+        self.assertIs(fingerprint({"a": object()}), None)
+
+describe TestCase, "DocumentCache":
+    before_each:
+        self.meta = Meta({}, [])
+        self.spec = sb.set_options(a=sb.listof(sb.integer_spec()))
+
+    it "remembers what documents normalise into":
+        cache = DocumentCache()
+        result = cache.normalise(self.spec, self.meta, {"a": ["1", "2"]})
+        self.assertEqual(result, {"a": [1, 2]})
+
+        with mock.patch.object(self.spec, "normalise") as normalise:
+            self.assertIs(cache.normalise(self.spec, self.meta, {"a": ["1", "2"]}), result)
+        self.assertEqual(normalise.mock_calls, [])
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1, "maxsize": 32})
+
+    it "remembers documents separately for each spec and path":
+        cache = DocumentCache()
+        other = sb.set_options(a=sb.listof(sb.string_spec()))
+        self.assertEqual(cache.normalise(self.spec, self.meta, {"a": "1"}), {"a": [1]})
+        self.assertEqual(cache.normalise(other, self.meta, {"a": "1"}), {"a": ["1"]})
+        self.assertEqual(cache.normalise(self.spec, self.meta.at("b"), {"a": "1"}), {"a": [1]})
+        self.assertEqual(cache.stats()["size"], 3)
+
+    it "includes meta.everything for specs that read it":
+        formatter = lambda options, path, value: mock.Mock(name="formatted", format=lambda: options["name"])
+        spec = sb.set_options(a=sb.formatted(sb.string_spec(), formatter=formatter))
+        cache = DocumentCache()
+        self.assertEqual(cache.normalise(spec, Meta({"name": "one"}, []), {"a": "{name}"}), {"a": "one"})
+        self.assertEqual(cache.normalise(spec, Meta({"name": "two"}, []), {"a": "{name}"}), {"a": "two"})
+
+    it "includes meta.everything for custom specs that don't say whether they read it":
+        class lookup_spec(sb.Spec):
+            def normalise_filled(self, meta, val):
+                return meta.everything["vars"][val]
+
+        spec = sb.set_options(a=lookup_spec())
+        cache = DocumentCache()
+        self.assertEqual(cache.normalise(spec, Meta({"vars": {"x": 1}}, []), {"a": "x"}), {"a": 1})
+        self.assertEqual(cache.normalise(spec, Meta({"vars": {"x": 2}}, []), {"a": "x"}), {"a": 2})
+
+    it "only walks the spec once to see if it reads meta.everything":
+        cache = DocumentCache()
+        meta = Meta({"b": 1}, [])
+        with mock.patch.object(sb, "reads_everything", mock.Mock(name="reads_everything", return_value=False)) as reads_everything:
+            for _ in range(3):
+                cache.normalise(self.spec, meta, {"a": "1"})
+        self.assertEqual(reads_everything.mock_calls, [mock.call(self.spec)])
+
+    it "doesn't remember documents it can't fingerprint or errors":
+        cache = DocumentCache()
+        spec = sb.set_options(a=sb.any_spec())
+        thing = object()
+        self.assertIs(cache.normalise(spec, self.meta, {"a": thing})["a"], thing)
+        with self.assertRaises(BadSpecValue):
+            cache.normalise(self.spec, self.meta, {"a": "b"})
+        self.assertEqual(cache.stats()["size"], 0)
+
+    it "can invalidate documents and specs":
+        cache = DocumentCache(maxsize=2)
+        other = sb.set_options(a=sb.listof(sb.string_spec()))
+        cache.normalise(self.spec, self.meta, {"a": "1"})
+        cache.normalise(self.spec, self.meta, {"a": "2"})
+        cache.normalise(other, self.meta, {"a": "1"})
+        self.assertEqual(cache.stats()["size"], 2)
+
+        cache.invalidate(other, self.meta, {"a": "1"})
+        self.assertEqual(cache.stats()["size"], 1)
+        cache.invalidate(self.spec)
+        self.assertEqual(cache.stats()["size"], 0)
@@ -0,0 +1,256 @@
+# coding: spec
+
+from input_algorithms.dictobj import dictobj, recordobj, class_attributes, cached_namedlists, unpack, iter_json, dump_json
+from input_algorithms import spec_base as sb
+from input_algorithms.meta import Meta
+
+from tests.helpers import TestCase
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+import weakref
+import pickle
+import json
+import six
+import gc
+
+class Thing(recordobj):
+    fields = ["one", ("two", 2), ("three", lambda: []), "four"]
+
+describe TestCase, "recordobj":
+    it "keeps values in slots":
+        thing = Thing(1, four=4)
+        self.assertEqual(Thing.__slots__, ("one", "four", "two", "three"))
+        assert not hasattr(thing, "__dict__")
+        self.assertEqual((thing.one, thing.two, thing.three, thing.four), (1, 2, [], 4))
+        self.assertIsNot(thing.three, Thing(1, 4).three)
+
+    it "takes positional arguments with defaulted fields last":
+        self.assertEqual(Thing(1, 4, 5, 6).items(), [("one", 1), ("four", 4), ("two", 5), ("three", 6)])
+
+    it "complains about bad arguments":
+        for args, kwargs in (((1, ), {}), ((1, 2, 3, 4, 5), {}), ((1, ), {"one": 2}), ((1, 4), {"five": 5})):
+            with self.assertRaises(TypeError):
+                Thing(*args, **kwargs)
+
+    it "allows access as attributes and items":
+        thing = Thing(1, 4)
+        thing["one"] = 5
+        thing.two = 6
+        self.assertEqual((thing["one"], thing.two, thing.get("four"), thing.get("five", 7)), (5, 6, 4, 7))
+        assert "one" in thing and "five" not in thing
+        self.assertEqual(list(thing), ["one", "four", "two", "three"])
+
+        with self.assertRaises(KeyError):
+            thing["five"]
+        with self.assertRaises(KeyError):
+            thing["five"] = 5
+        with self.assertRaises(AttributeError):
+            thing.five = 5
+
+    it "can be cloned, compared and pickled":
+        thing = Thing(1, 4, three=[3])
+        clone = thing.clone()
+        self.assertEqual(clone, thing)
+        self.assertIs(clone.three, thing.three)
+        clone.one = 2
+        self.assertNotEqual(clone, thing)
+        self.assertEqual(pickle.loads(pickle.dumps(thing)), thing)
+
+    it "makes nested dictionaries":
+        class Other(dictobj):
+            fields = ["five"]
+        thing = Thing(Thing(1, 2), Other(five=5))
+        self.assertEqual(thing.as_dict(), {"one": {"one": 1, "two": 2, "three": [], "four": 2}, "four": {"five": 5}, "two": 2, "three": []})
+
+    it "only makes slots for new fields in subclasses":
+        class More(Thing):
+            fields = Thing.fields + ["five"]
+        self.assertEqual(More.__slots__, ("five", ))
+        self.assertEqual(More(1, 4, 5).items(), [("one", 1), ("four", 4), ("five", 5), ("two", 2), ("three", [])])
+
+    it "works with create_spec":
+        spec = sb.create_spec(Thing, one=sb.integer_spec(), four=sb.defaulted(sb.string_spec(), "d"))
+        thing = spec.normalise(Meta({}, []), {"one": "1"})
+        self.assertEqual(thing, Thing(1, "d", 2, []))
+
+describe TestCase, "dictobj":
+    it "knows the attributes on each class":
+        class Thing(dictobj):
+            fields = ["one", "items"]
+            def method(self):
+                pass
+
+        names = class_attributes(Thing)
+        for name in ("fields", "method", "items", "keys", "mro", "__init__", "as_dict"):
+            assert name in names, name
+        assert "one" not in names
+        self.assertIs(class_attributes(Thing), names)
+
+    it "doesn't keep classes alive by knowing their attributes":
+        class Thing(dictobj):
+            fields = ["one"]
+
+        class_attributes(Thing)
+        thing = weakref.ref(Thing)
+        del Thing
+        gc.collect()
+        self.assertIs(thing(), None)
+
+    it "sets fields that are also class attributes on the instance too":
+        class Thing(dictobj):
+            fields = ["one", "method"]
+            def method(self):
+                return "method"
+
+        thing = Thing(one=1, method=2)
+        self.assertEqual((thing.one, thing["one"], thing[u"one"]), (1, 1, 1))
+        self.assertEqual((thing.method, thing["method"], thing.__dict__["method"]), (2, 2, 2))
+
+        thing.one = 3
+        thing["two"] = 4
+        self.assertEqual((thing.one, thing.two, dict(thing)["two"]), (3, 4, 4))
+
+        with self.assertRaises(AttributeError):
+            thing.three
+
+    it "clones without making defaults again":
+        called = []
+        def make_list():
+            called.append(True)
+            return []
+
+        class Thing(dictobj):
+            fields = ["one", ("two", make_list), ("items", 3)]
+
+        thing = Thing(1)
+        thing["extra"] = 4
+        clone = thing.clone(one=5, items=6)
+
+        self.assertEqual(len(called), 1)
+        self.assertIs(type(clone), Thing)
+        self.assertIs(clone.two, thing.two)
+        self.assertEqual(clone, {"one": 5, "two": [], "items": 6, "extra": 4})
+        self.assertEqual(clone.items, 6)
+        self.assertEqual(thing, {"one": 1, "two": [], "items": 3, "extra": 4})
+        self.assertEqual(thing.items, 3)
+
+    describe "defaults":
+        it "calls callable defaults for each instance that needs them":
+            called = []
+            def make_list():
+                called.append(True)
+                return []
+
+            class Thing(dictobj):
+                fields = ["one", ("two", make_list), ("three", 3)]
+
+            first = Thing(1)
+            second = Thing(1)
+            self.assertEqual(first, {"one": 1, "two": [], "three": 3})
+            self.assertIsNot(first.two, second.two)
+            self.assertEqual(len(called), 2)
+
+            self.assertEqual(Thing(1, [2]).two, [2])
+            self.assertEqual(len(called), 2)
+
+        it "makes the namedlist once per class":
+            class Thing(dictobj):
+                fields = ["one", ("two", lambda: object())]
+
+            before = len(cached_namedlists)
+            made = Thing(1).make_defaults()
+            for _ in range(5):
+                self.assertIs(Thing(1).make_defaults(), made)
+            self.assertEqual(len(cached_namedlists), before + 1)
+
+            class Other(dictobj):
+                fields = ["one", ("two", lambda: object())]
+            Other(1)
+            self.assertEqual(len(cached_namedlists), before + 1)
+
+        it "makes defaults that call the callables":
+            class Thing(dictobj):
+                fields = ["one", ("two", list), ("three", 3)]
+
+            defaults = Thing(1).make_defaults()(1)
+            self.assertEqual((defaults.one, defaults.two, defaults.three), (1, [], 3))
+            self.assertEqual(Thing(1).make_defaults()(1, [2]).two, [2])
+
+        it "doesn't keep classes alive by remembering their namedlist":
+            class Thing(dictobj):
+                fields = ["collected", ("later", list)]
+
+            Thing(1)
+            thing = weakref.ref(Thing)
+            del Thing
+            gc.collect()
+            self.assertIs(thing(), None)
+
+        it "notices when fields is replaced":
+            class Thing(dictobj):
+                fields = ["one"]
+            self.assertEqual(Thing(1), {"one": 1})
+
+            Thing.fields = ["one", ("two", list)]
+            self.assertEqual(Thing(1), {"one": 1, "two": []})
+
+class Item(dictobj):
+    fields = ["name", ("tags", list)]
+
+class Custom(dictobj):
+    fields = ["name"]
+
+    def as_dict(self, **kwargs):
+        return {"custom": self.name, "kwargs": kwargs}
+
+describe TestCase, "unpacking":
+    before_each:
+        self.thing = Item("outer", [Item("a"), (Thing(1, 4), 5), {"b": Item("b", ["c"]), 1: None}, Custom("d")])
+        self.expected = {"name": "outer", "tags": [{"name": "a", "tags": []}, ({"one": 1, "two": 2, "three": [], "four": 4}, 5), {"b": {"name": "b", "tags": ["c"]}, 1: None}, {"custom": "d", "kwargs": {"extra": True}}]}
+
+    it "goes into lists, tuples and dictionaries":
+        self.assertEqual(self.thing.as_dict(extra=True), self.expected)
+        self.assertEqual(unpack([self.thing], {"extra": True}), [self.expected])
+
+    it "doesn't copy values that don't need changing":
+        tags = ["a", 1, None]
+        thing = Item("thing", tags)
+        self.assertIs(thing.as_dict()["tags"], tags)
+
+    it "uses the as_dict of the object itself only when asked":
+        self.assertEqual(unpack(Custom("d")), {"custom": "d", "kwargs": {}})
+        self.assertEqual(unpack(Custom("d"), walk_root=True), {"name": "d"})
+
+    it "doesn't recurse":
+        thing = Item("leaf")
+        for _ in range(5000):
+            thing = Item("branch", [thing])
+        self.assertEqual(unpack(thing)["name"], "branch")
+        self.assertEqual("".join(iter_json(thing))[:53], '{"name": "branch", "tags": [{"name": "branch", "tags"')
+
+    it "complains about circular references":
+        thing = Item("thing")
+        thing.tags.append(thing)
+        with self.assertRaises(ValueError):
+            thing.as_dict()
+
+    it "streams json":
+        expected = json.loads(json.dumps(self.expected))
+        self.assertEqual(json.loads("".join(iter_json(self.thing, extra=True))), expected)
+
+        fle = six.StringIO()
+        dump_json(self.thing, fle, encoder=json.JSONEncoder(separators=(",", ":")), extra=True)
+        self.assertNotIn(" ", fle.getvalue())
+        self.assertEqual(json.loads(fle.getvalue()), expected)
+
+        with self.assertRaises(TypeError):
+            "".join(iter_json({(1, 2): [self.thing]}))
+
+    it "uses the sort_keys and skipkeys of the encoder":
+        val = {"z": Item("b", ["c"]), "a": [Item("a"), {"y": None, "x": 1}], "m": Custom("d")}
+        encoder = json.JSONEncoder(sort_keys=True)
+        self.assertEqual("".join(iter_json(val, encoder=encoder)), json.dumps(unpack(val), sort_keys=True))
+
+        val = {"a": [Item("a")], (1, 2): [Item("b")]}
+        encoder = json.JSONEncoder(skipkeys=True)
+        self.assertEqual("".join(iter_json(val, encoder=encoder)), json.dumps(unpack(val), skipkeys=True))
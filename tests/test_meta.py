@@ -57,11 +57,81 @@ describe TestCase, "Meta":
                 self.assertIs(new.everything, self.everything)
                 assert isinstance(new, MetaSub), type(new)
 
+            it "only holds the new part and the meta it came from":
+                p3 = mock.Mock(name="p3")
+                new = self.meta.new_path([(p3, "")])
+                self.assertIs(new._parent, self.meta)
+                self.assertEqual(new._parts, [(p3, "")])
+
+            it "puts the path together from all the parents":
+                meta = Meta(self.everything, "one").at("two").indexed_at(3).at("four")
+                self.assertEqual(meta._path, [("one", ""), ("two", ""), ("", "[3]"), ("four", "")])
+                self.assertEqual(meta.path, "one.two[3].four")
+                self.assertEqual(meta.nonspecial_path, "one.two.four")
+                self.assertEqual(meta.key_names(), {"_key_name_0": "four", "_key_name_1": "", "_key_name_2": "two", "_key_name_3": "one"})
+
+        describe "fail_fast":
+            it "isn't fail fast by default":
+                self.assertIs(self.meta.fail_fast, False)
+                self.assertIs(self.meta.at("one").fail_fast, False)
+
+            it "passes fail_fast onto new paths":
+                meta = Meta(self.everything, self.path, fail_fast=True)
+                self.assertIs(meta.at("one").indexed_at(0).fail_fast, True)
+
+            it "can make a fail fast copy":
+                new = self.meta.with_fail_fast()
+                self.assertIs(new.fail_fast, True)
+                self.assertIs(self.meta.fail_fast, False)
+                self.assertEqual(new._path, self.meta._path)
+                self.assertIs(new.everything, self.everything)
+
     describe "Joining the path":
         it "Joins each nonempty first item with dots and adds second items as extra":
             meta = Meta(mock.Mock(name="everything"), [("one", ""), ("two", "[3]"), ("", "[4]"), ("", ""), ("five", "")])
             self.assertEqual(meta.path, "one.two[3][4].five")
 
+        it "remembers the path strings":
+            meta = Meta(mock.Mock(name="everything"), "one").at("two").indexed_at(3)
+            self.assertEqual(meta.path, "one.two[3]")
+            self.assertEqual(meta.nonspecial_path, "one.two")
+
+            with mock.patch("input_algorithms.meta.join_path") as join_path:
+                with mock.patch("input_algorithms.meta.join_nonspecial_path") as join_nonspecial_path:
+                    self.assertEqual(meta.path, "one.two[3]")
+                    self.assertEqual(meta.nonspecial_path, "one.two")
+            self.assertEqual(join_path.mock_calls, [])
+            self.assertEqual(join_nonspecial_path.mock_calls, [])
+
+        it "can share path strings between metas with the same path":
+            class Interned(Meta):
+                intern_paths = True
+
+            first = Interned({}, "one").at("two").indexed_at(3)
+            second = Interned({}, "one").at("two").indexed_at(3)
+            self.assertIs(first.path, second.path)
+            self.assertIs(first.nonspecial_path, second.nonspecial_path)
+
+            unhashable = Interned({}, [("one", [1])])
+            self.assertEqual(unhashable.path, "one[1]")
+
+        it "doesn't mind the interned paths being cleared by another thread":
+            class Interned(Meta):
+                intern_paths = True
+
+            class Clearing(dict):
+                def setdefault(self, key, val):
+                    found = super(Clearing, self).setdefault(key, val)
+                    self.clear()
+                    return found
+
+                def __setitem__(self, key, val):
+                    super(Clearing, self).__setitem__(key, val)
+                    self.clear()
+
+            with mock.patch("input_algorithms.meta.interned_paths", Clearing()):
+                self.assertEqual(Interned({}, "one").at("two").path, "one.two")
+
     describe "Finding the source of something":
         it "returns unknown source_for":
             everything = mock.Mock(name="everything", spec=[])
@@ -0,0 +1,122 @@
+# coding: spec
+
+from input_algorithms.profiling import profiling
+from input_algorithms.errors import BadSpecValue
+from input_algorithms import spec_base as sb
+from input_algorithms.meta import Meta
+
+from tests.helpers import TestCase
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+import tempfile
+import pstats
+import six
+import os
+
+describe TestCase, "profiling":
+    before_each:
+        self.meta = Meta({}, [])
+        self.spec = sb.set_options(
+              a = sb.listof(sb.integer_spec())
+            , b = sb.set_options(c=sb.overridden(1))
+            )
+        self.val = {"a": ["1", "2"], "b": {}}
+
+    it "records calls by spec class":
+        with profiling() as profiler:
+            self.assertEqual(self.spec.normalise(self.meta, self.val), {"a": [1, 2], "b": {"c": 1}})
+
+        by_class = profiler.by_class()
+        self.assertEqual(dict((name, timing["calls"]) for name, timing in by_class.items()), {"set_options": 2, "listof": 1, "integer_spec": 2, "overridden": 1})
+
+        for timing in by_class.values():
+            assert timing["inclusive"] >= timing["exclusive"] >= 0
+        assert by_class["listof"]["inclusive"] >= by_class["integer_spec"]["inclusive"]
+
+    it "records calls by path":
+        with profiling() as profiler:
+            self.spec.normalise(self.meta, self.val)
+
+        by_path = profiler.by_path()
+        self.assertEqual(dict((path, timing["calls"]) for path, timing in by_path.items()), {"": 1, "a": 3, "b": 1, "b.c": 1})
+        assert by_path[""]["inclusive"] >= by_path["a"]["inclusive"]
+
+    it "records calls that fail":
+        with profiling() as profiler:
+            with self.assertRaises(BadSpecValue):
+                self.spec.normalise(self.meta, {"a": "b"})
+        self.assertEqual(profiler.by_class()["integer_spec"]["calls"], 1)
+
+    it "puts back the original normalise methods":
+        originals = dict((kls, kls.__dict__["normalise"]) for kls in (sb.Spec, sb.overridden, sb.fail_fast_spec))
+        with profiling():
+            self.assertIsNot(sb.Spec.__dict__["normalise"], originals[sb.Spec])
+        for kls, original in originals.items():
+            self.assertIs(kls.__dict__["normalise"], original)
+
+        with profiling() as profiler:
+            pass
+        self.spec.normalise(self.meta, self.val)
+        self.assertEqual(profiler.by_class(), {})
+
+    it "puts back the original normalise methods when profilers overlap":
+        original = sb.Spec.__dict__["normalise"]
+        first = profiling()
+        second = profiling()
+
+        first.__enter__()
+        second.__enter__()
+        self.spec.normalise(self.meta, self.val)
+        first.__exit__(None, None, None)
+        self.spec.normalise(self.meta, self.val)
+        second.__exit__(None, None, None)
+
+        self.assertIs(sb.Spec.__dict__["normalise"], original)
+        self.assertEqual(first.by_class()["integer_spec"]["calls"], 2)
+        self.assertEqual(second.by_class()["integer_spec"]["calls"], 4)
+
+    it "sees specs inside and_spec whenever they were first used":
+        spec = sb.and_spec(sb.string_spec(), sb.integer_spec())
+        spec.normalise(self.meta, "1")
+
+        with profiling() as profiler:
+            spec.normalise(self.meta, "1")
+        calls = dict((name, timing["calls"]) for name, timing in profiler.by_class().items())
+        self.assertEqual(calls, {"and_spec": 1, "string_spec": 1, "integer_spec": 1})
+
+        spec.normalise(self.meta, "1")
+        self.assertEqual(profiler.by_class()["integer_spec"]["calls"], 1)
+
+    it "makes stats for pstats":
+        with profiling() as profiler:
+            self.spec.normalise(self.meta, self.val)
+
+        stats = pstats.Stats(profiler)
+        key = ("input_algorithms.spec_base", 0, "integer_spec")
+        primitive_calls, calls, tottime, cumtime, callers = stats.stats[key]
+        self.assertEqual((primitive_calls, calls), (2, 2))
+        self.assertEqual(list(callers), [("input_algorithms.spec_base", 0, "listof")])
+
+        # set_options inside set_options only counts the outer call as primitive
+        self.assertEqual(stats.stats[("input_algorithms.spec_base", 0, "set_options")][:2], (1, 2))
+
+        fle, filename = tempfile.mkstemp()
+        os.close(fle)
+        try:
+            profiler.dump_stats(filename)
+            self.assertEqual(pstats.Stats(filename).stats[key][:2], (2, 2))
+        finally:
+            os.remove(filename)
+
+    it "makes collapsed stacks":
+        with profiling() as profiler:
+            self.spec.normalise(self.meta, self.val)
+
+        stacks = [line.rsplit(" ", 1)[0] for line in profiler.collapsed().strip().split("\n")]
+        self.assertEqual(stacks, [
+              "set_options"
+            , "set_options;listof"
+            , "set_options;listof;integer_spec"
+            , "set_options;set_options"
+            , "set_options;set_options;overridden"
+            ])
@@ -2,16 +2,23 @@
 
 from input_algorithms.spec_base import Spec, NotSpecified, pass_through_spec, always_same_spec
 from input_algorithms.errors import BadSpec, BadSpecValue, BadDirectory, BadFilename
-from input_algorithms import spec_base as sb
+from input_algorithms import spec_base as sb, validators
 from input_algorithms.meta import Meta
 
 from tests.helpers import TestCase
 
 from noseOfYeti.tokeniser.support import noy_sup_setUp
 from namedlist import namedlist
+from unittest import SkipTest
+import pickle
 import mock
 import six
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 describe TestCase, "Spec":
     it "takes in positional arguments and keyword arguments":
         m1 = mock.Mock("m1")
@@ -159,6 +166,34 @@ describe TestCase, "Spec":
                     with self.fuzzyAssertRaisesError(BadSpec, "Spec doesn't know how to deal with this value", meta=meta, val=val):
                         Specd().normalise(meta, val)
 
+    describe "dispatch":
+        it "notices hooks added to the class after it was made":
+            meta = mock.Mock(name="meta")
+            Specd = type("Specd", (Spec, ), {})
+            Child = type("Child", (Specd, ), {})
+            self.assertIs(Child().normalise(meta, NotSpecified), NotSpecified)
+
+            Specd.default = lambda s, m: "dflt"
+            self.assertEqual(Child().normalise(meta, NotSpecified), "dflt")
+            self.assertEqual(Child().fake_filled(meta), "dflt")
+
+            del Specd.default
+            self.assertIs(Child().normalise(meta, NotSpecified), NotSpecified)
+
+        it "notices hooks set on the instance":
+            meta = mock.Mock(name="meta")
+            spec = type("Specd", (Spec, ), {})()
+            other = type(spec)()
+
+            spec.normalise_filled = lambda m, v: v + 1
+            self.assertEqual(spec.normalise(meta, 1), 2)
+            with self.fuzzyAssertRaisesError(BadSpec, "Spec doesn't know how to deal with this value"):
+                other.normalise(meta, 1)
+
+            del spec.normalise_filled
+            with self.fuzzyAssertRaisesError(BadSpec, "Spec doesn't know how to deal with this value"):
+                spec.normalise(meta, 1)
+
 describe TestCase, "pass_through_spec":
     it "just returns whatever it is given":
         val = mock.Mock(name="val")
@@ -322,6 +357,20 @@ describe TestCase, "listof":
         self.assertEqual(proxied_spec.normalise.mock_calls, [mock.call(indexed_one, "stuff"), mock.call(indexed_three, "blah")])
         self.assertEqual(result, [val1, val_same, val2, val_same])
 
+    it "uses normalise_many on the spec if there is no expect":
+        result = mock.Mock(name="result")
+        spec = sb.integer_spec()
+        meta = Meta({}, [])
+        with mock.patch.object(spec, "normalise_many", return_value=result) as normalise_many:
+            self.assertIs(sb.listof(spec).normalise(meta, [1, 2]), result)
+            self.assertIs(sb.listof(spec).compile()(meta, [1, 2]), result)
+        self.assertEqual(normalise_many.mock_calls, [mock.call(meta, [1, 2]), mock.call(meta, [1, 2])])
+
+    it "treats a numpy array as a list":
+        if numpy is None:
+            raise SkipTest("Need numpy for this test")
+        self.assertEqual(sb.listof(sb.float_spec()).normalise(Meta({}, []), numpy.array([1, 2])), [1.0, 2.0])
+
     it "complains about values that don't match the spec":
         meta = mock.Mock(name="meta")
         spec = mock.Mock(name="spec")
@@ -659,6 +708,51 @@ describe TestCase, "string_specs":
             validator1.normalise.assert_called_once_with(self.meta, "blah")
             validator2.normalise.assert_called_once_with(self.meta, result1)
 
+        describe "combined":
+            before_each:
+                self.meta = Meta({}, [])
+
+            it "only runs the validators one at a time when the combined regex doesn't match":
+                spec = self.make_spec(validators.no_whitespace(), validators.no_dots(), validators.regexed("[a-z]+", ".*z$"), combined=True)
+                regex, others = spec.combined_check()
+                self.assertEqual(others, [])
+
+                for normalise in (spec.normalise, spec.compile()):
+                    with mock.patch.object(validators.no_dots, "validate") as validate:
+                        self.assertEqual(normalise(self.meta, "abcz"), "abcz")
+                    self.assertEqual(validate.mock_calls, [])
+
+                    for val, messages in (("ab z", ["Expected no whitespace"]), ("a.bz", ["Expected no dots"]), ("abc", ["Expected value to match regex, it didn't"]), ("1 .", ["Expected no whitespace", "Expected no dots", "Expected value to match regex, it didn't"])):
+                        with self.assertRaises(BadSpecValue) as error:
+                            normalise(self.meta, val)
+                        self.assertEqual([e.message for e in error.exception.errors], messages)
+
+            it "still runs validators that can't be combined":
+                validator = validators.choice("ab", "cd")
+                spec = self.make_spec(validators.no_dots(), validators.regexed("(a)b"), validator, combined=True)
+                self.assertEqual(spec.combined_check()[1], [spec.validators[1], validator])
+
+                for normalise in (spec.normalise, spec.compile()):
+                    self.assertEqual(normalise(self.meta, "ab"), "ab")
+                    with self.assertRaises(BadSpecValue) as error:
+                        normalise(self.meta, "ef")
+                    self.assertEqual([e.message for e in error.exception.errors], ["Expected value to match regex, it didn't", "Expected the value to be one of the valid choices"])
+
+            it "doesn't skip validators that see a value changed by an earlier one":
+                class add_space(validators.Validator):
+                    def validate(self, meta, val):
+                        return val + " x"
+
+                spec = self.make_spec(add_space(), validators.no_whitespace(), combined=True)
+                self.assertIs(spec.combined_check(), None)
+                for normalise in (spec.normalise, spec.compile()):
+                    with self.assertRaises(BadSpecValue) as error:
+                        normalise(self.meta, "abc")
+                    self.assertEqual([e.message for e in error.exception.errors], ["Expected no whitespace"])
+
+            it "isn't used unless asked for":
+                self.assertIs(self.make_spec(validators.no_dots()).combined_check(), None)
+
     describe "string_choice_spec":
         def make_spec(self, choices=NotSpecified, reason=NotSpecified):
             choices = ["", "adsf", "asdf"] if choices is NotSpecified else choices
@@ -681,6 +775,53 @@ describe TestCase, "string_specs":
             with self.fuzzyAssertRaisesError(BadSpecValue, reason, available=choices, got="blah", meta=self.meta):
                 self.make_spec(choices, reason=reason).normalise(self.meta, "blah")
 
+describe TestCase, "ChoiceIndex":
+    it "finds hashable choices with a set":
+        index = sb.ChoiceIndex(["one", 2, (3, 4)])
+        self.assertEqual(index.hashed, set(["one", 2, (3, 4)]))
+        for val in ("one", 2, 2.0, (3, 4)):
+            assert val in index, val
+        for val in ("two", 3, (3, ), None):
+            assert val not in index, val
+
+    it "looks for unhashable choices and values one at a time":
+        index = sb.ChoiceIndex(("one", [1], {"a": 2}))
+        self.assertEqual(index.unhashable, [[1], {"a": 2}])
+        for val in ("one", [1], {"a": 2}):
+            assert val in index, val
+        for val in ([2], {"a": 3}, "two"):
+            assert val not in index, val
+
+    it "uses in from choices that aren't lists or tuples":
+        index = sb.ChoiceIndex("abc")
+        self.assertIs(index.hashed, None)
+        assert "ab" in index
+        assert "ac" not in index
+
+    it "is made again when the choices are replaced":
+        spec = sb.string_choice_spec(["one"])
+        meta = Meta({}, [])
+        self.assertEqual(spec.normalise(meta, "one"), "one")
+        index = sb.choice_index(spec)
+        self.assertIs(sb.choice_index(spec), index)
+
+        spec.choices = ["two"]
+        self.assertEqual(spec.normalise(meta, "two"), "two")
+        with self.fuzzyAssertRaisesError(BadSpecValue, "Expected one of the available choices", available=["two"], got="one", meta=meta):
+            spec.normalise(meta, "one")
+
+    it "is made again when choices are added or removed":
+        spec = sb.string_choice_spec(["one"])
+        meta = Meta({}, [])
+        self.assertEqual(spec.normalise(meta, "one"), "one")
+
+        spec.choices.append("two")
+        self.assertEqual(spec.normalise(meta, "two"), "two")
+
+        spec.choices.remove("one")
+        with self.assertRaises(BadSpecValue):
+            spec.normalise(meta, "one")
+
 describe TestCase, "integer_spec":
     it "converts string integers into integers":
         meta = mock.Mock(name="meta")
@@ -696,6 +837,45 @@ describe TestCase, "integer_spec":
             with self.fuzzyAssertRaisesError(BadSpecValue, "Expected an integer", meta=meta, got=typ):
                 sb.integer_spec().normalise(meta, val)
 
+    describe "normalise_many":
+        it "normalises all the values":
+            meta = Meta({}, [])
+            self.assertEqual(sb.integer_spec().normalise_many(meta, [1, 2, 3]), [1, 2, 3])
+            self.assertEqual(sb.integer_spec().normalise_many(meta, [1, "2", 3]), [1, 2, 3])
+
+        it "collects errors for each value":
+            meta = Meta({}, [])
+            with self.assertRaises(BadSpecValue) as error:
+                sb.integer_spec().normalise_many(meta, [1, True, "a"])
+            self.assertEqual([e.kwargs["meta"].path for e in error.exception.errors], ["[1]", "[2]"])
+
+        it "converts numpy integer arrays":
+            if numpy is None:
+                raise SkipTest("Need numpy for this test")
+            meta = Meta({}, [])
+            result = sb.integer_spec().normalise_many(meta, numpy.arange(3))
+            self.assertEqual(result, [0, 1, 2])
+            self.assertEqual([type(val) for val in result], [int, int, int])
+
+            with self.assertRaises(BadSpecValue):
+                sb.integer_spec().normalise_many(meta, numpy.array([1.5]))
+
+        it "uses the normalise_filled of subclasses":
+            class positive_int(sb.integer_spec):
+                def normalise_filled(self, meta, val):
+                    val = super(positive_int, self).normalise_filled(meta, val)
+                    if val < 0:
+                        raise BadSpecValue("Expected a positive integer", meta=meta)
+                    return val
+
+            meta = Meta({}, [])
+            spec = sb.listof(positive_int())
+            for normalise in (spec.normalise, spec.compile()):
+                self.assertEqual(normalise(meta, [1, 2]), [1, 2])
+                with self.assertRaises(BadSpecValue) as error:
+                    normalise(meta, [-1, 2, -2])
+                self.assertEqual([e.kwargs["meta"].path for e in error.exception.errors], ["[0]", "[2]"])
+
 describe TestCase, "float_spec":
     it "converts string floats into floats":
         meta = mock.Mock(name="meta")
@@ -711,6 +891,33 @@ describe TestCase, "float_spec":
             with self.fuzzyAssertRaisesError(BadSpecValue, "Expected a float", meta=meta, got=typ):
                 sb.float_spec().normalise(meta, val)
 
+    describe "normalise_many":
+        it "normalises all the values":
+            meta = Meta({}, [])
+            self.assertEqual(sb.float_spec().normalise_many(meta, [1, 2.5, "3.5"]), [1.0, 2.5, 3.5])
+
+        it "complains about booleans":
+            meta = Meta({}, [])
+            with self.assertRaises(BadSpecValue) as error:
+                sb.float_spec().normalise_many(meta, [1, False])
+            self.assertEqual([e.kwargs["meta"].path for e in error.exception.errors], ["[1]"])
+
+        it "converts numpy arrays":
+            if numpy is None:
+                raise SkipTest("Need numpy for this test")
+            meta = Meta({}, [])
+            self.assertEqual(sb.float_spec().normalise_many(meta, numpy.array([1, 2])), [1.0, 2.0])
+
+        it "uses the normalise_filled of subclasses":
+            class rounded(sb.float_spec):
+                def normalise_filled(self, meta, val):
+                    return round(super(rounded, self).normalise_filled(meta, val))
+
+            meta = Meta({}, [])
+            spec = sb.listof(rounded())
+            for normalise in (spec.normalise, spec.compile()):
+                self.assertEqual(normalise(meta, [1.4, 2.6]), [1, 3])
+
 describe TestCase, "create_spec":
     before_each:
         self.meta = mock.Mock(name="meta", spec_set=Meta)
@@ -860,6 +1067,54 @@ describe TestCase, "or_spec":
         self.spec2.normalise.assert_called_once_with(self.meta, self.val)
         self.spec3.normalise.assert_called_once_with(self.meta, self.val)
 
+    describe "skipping specs":
+        before_each:
+            self.meta = Meta({}, [])
+
+        it "doesn't try specs that can't accept the type of the value":
+            spec = sb.or_spec(sb.boolean(), sb.dictionary_spec(), sb.integer_spec(), sb.string_spec())
+            with mock.patch.object(sb.boolean, "normalise_filled") as boolean_filled:
+                with mock.patch.object(sb.dictionary_spec, "normalise_filled") as dictionary_filled:
+                    self.assertEqual(spec.normalise(self.meta, "1"), 1)
+                    self.assertEqual(spec.normalise(self.meta, "a"), "a")
+            self.assertEqual(boolean_filled.mock_calls, [])
+            self.assertEqual(dictionary_filled.mock_calls, [])
+            self.assertEqual(spec.candidates[str], (spec.specs, (2, 3)))
+
+        it "complains with an error from every spec in order":
+            spec = sb.or_spec(sb.boolean(), sb.float_spec(), sb.dictionary_spec())
+            for normalise in (spec.normalise, spec.compile()):
+                with self.assertRaises(BadSpecValue) as error:
+                    normalise(self.meta, "a")
+                self.assertEqual([e.message for e in error.exception.errors], ["Expected a boolean", "Expected a float", "Expected a dictionary"])
+
+        it "still uses the first spec that succeeds in the order given":
+            spec = sb.or_spec(sb.integer_spec(), sb.any_spec())
+            for normalise in (spec.normalise, spec.compile()):
+                self.assertEqual(normalise(self.meta, bytearray(b"12")), 12)
+
+        it "doesn't trust accepts from a parent class that doesn't normalise the same way":
+            class lenient_string_spec(sb.string_spec):
+                def normalise_filled(self, meta, val):
+                    return str(val)
+
+            self.assertEqual(sb.accepted_types(sb.string_spec()), six.string_types)
+            self.assertIs(sb.accepted_types(lenient_string_spec()), None)
+            self.assertEqual(sb.or_spec(sb.boolean(), lenient_string_spec()).normalise(self.meta, 1), "1")
+
+        it "tries the last spec that succeeded first if exclusive":
+            spec = sb.or_spec(sb.integer_spec(), sb.float_spec(), exclusive=True)
+            self.assertEqual(spec.normalise(self.meta, "1.5"), 1.5)
+            self.assertEqual(spec.candidates[str], (spec.specs, (1, 0)))
+
+            with mock.patch.object(sb.integer_spec, "normalise_filled") as integer_filled:
+                self.assertEqual(spec.normalise(self.meta, "2.5"), 2.5)
+            self.assertEqual(integer_filled.mock_calls, [])
+
+            with self.assertRaises(BadSpecValue) as error:
+                spec.normalise(self.meta, [])
+            self.assertEqual([e.message for e in error.exception.errors], ["Expected an integer", "Expected a float"])
+
 describe TestCase, "match_spec":
     it "uses the spec that matches the type":
         ret1, ret2, ret3 = mock.Mock(name="ret1"), mock.Mock(name="ret2"), mock.Mock(name="ret3")
@@ -892,6 +1147,19 @@ describe TestCase, "match_spec":
         self.assertEqual(spec.normalise(meta, True), "lolz")
         self.assertEqual(spec.normalise(meta, "hahah"), "hahah")
 
+    it "remembers which spec to use for each type":
+        spec = sb.match_spec((bool, sb.boolean()), (int, sb.integer_spec()), (object, sb.any_spec()))
+        meta = Meta({}, [])
+        for normalise in (spec.normalise, spec.compile()):
+            self.assertIs(normalise(meta, True), True)
+            self.assertEqual(normalise(meta, 2), 2)
+            self.assertEqual(normalise(meta, "3"), "3")
+        self.assertEqual(spec.matched, {bool: 0, int: 1, str: 2})
+
+        spec.specs = [(str, sb.integer_spec())]
+        self.assertEqual(spec.normalise(meta, "3"), 3)
+        self.assertEqual(spec.matched, {str: 0})
+
 describe TestCase, "and_spec":
     before_each:
         self.val = mock.Mock(name="val")
@@ -926,10 +1194,35 @@ describe TestCase, "and_spec":
         with self.fuzzyAssertRaisesError(BadSpecValue, "Value didn't match one of the options", meta=self.meta, transformations=[self.val, val1], _errors=[error]):
             sb.and_spec(self.spec1, self.spec2, self.spec3).normalise(self.meta, self.val)
 
-        self.spec1.normalise.assert_called_once_with(self.meta, self.val)
-        self.spec2.normalise.assert_called_once_with(self.meta, val1)
+        # The specs are gone through a second time to find the transformations
+        self.assertEqual(self.spec1.normalise.mock_calls, [mock.call(self.meta, self.val)] * 2)
+        self.assertEqual(self.spec2.normalise.mock_calls, [mock.call(self.meta, val1)] * 2)
         self.assertEqual(self.spec3.normalise.mock_calls, [])
 
+    it "flattens nested and_specs and wrappers":
+        inner = sb.and_spec(sb.required(sb.string_spec()), sb.optional_spec(sb.valid_string_spec(validators.no_dots())))
+        spec = sb.and_spec(sb.defaulted(inner, "1"), sb.integer_spec())
+        self.assertEqual([s.__class__ for s in spec.flattened()], [sb.string_spec, sb.valid_string_spec, sb.integer_spec])
+
+        meta = Meta({}, [])
+        for normalise in (spec.normalise, spec.compile()):
+            self.assertEqual(normalise(meta, "2"), 2)
+
+            with self.assertRaises(BadSpecValue) as error:
+                normalise(meta, "2.3")
+            self.assertEqual(error.exception.kwargs["transformations"], ["2.3"])
+            self.assertEqual(error.exception.errors[0].kwargs["transformations"], ["2.3", "2.3"])
+            self.assertIn("Expected no dots", str(error.exception))
+
+    it "doesn't flatten wrappers that normalise differently":
+        class shouty(sb.required):
+            def normalise_filled(self, meta, val):
+                return val.upper()
+
+        spec = sb.and_spec(shouty(sb.string_spec()), sb.string_spec())
+        self.assertEqual([s.__class__ for s in spec.flattened()], [shouty, sb.string_spec])
+        self.assertEqual(spec.normalise(Meta({}, []), "a"), "A")
+
 describe TestCase, "optional_spec":
     before_each:
         self.val = mock.Mock(name="val")
@@ -1164,3 +1457,398 @@ describe TestCase, "delayed":
         self.assertEqual(called, [1])
         fake_filled.assert_called_once_with(meta, with_non_defaulted=False)
 
+
+describe TestCase, "compile":
+    before_each:
+        self.meta = Meta({}, [])
+        self.spec = sb.set_options(
+              name = sb.required(sb.string_spec())
+            , port = sb.defaulted(sb.integer_spec(), 80)
+            , tags = sb.listof(sb.string_choice_spec(["one", "two"]))
+            , extra = sb.dictof(sb.string_spec(), sb.or_spec(sb.boolean(), sb.float_spec()), nested=True)
+            , kind = sb.match_spec((six.string_types, sb.valid_string_spec()), (bool, sb.overridden("flag")))
+            , transformed = sb.optional_spec(sb.and_spec(sb.string_spec(), sb.integer_spec()))
+            , wrapped = sb.container_spec(tuple, sb.listof(sb.integer_spec()))
+            )
+
+    it "normalises the same as the spec":
+        val = {"name": "thing", "tags": ["one", "two"], "extra": {"a": True, "b": {"c": "1.5"}}, "kind": True, "transformed": "12", "wrapped": ["1", 2]}
+        expected = self.spec.normalise(self.meta, val)
+        self.assertEqual(self.spec.compile()(self.meta, val), expected)
+        self.assertEqual(expected
+            , {"name": "thing", "port": 80, "tags": ["one", "two"], "extra": {"a": True, "b": {"c": 1.5}}, "kind": "flag", "transformed": 12, "wrapped": (1, 2)}
+            )
+
+    it "raises the same errors as the spec":
+        val = {"tags": ["three", 1], "extra": {"a": "nope", "b": {"c": []}}, "kind": 1, "transformed": "asdf", "wrapped": "b"}
+
+        with self.assertRaises(BadSpecValue) as expected:
+            self.spec.normalise(self.meta, val)
+
+        with self.assertRaises(BadSpecValue) as compiled:
+            self.spec.compile()(self.meta, val)
+
+        self.assertEqual(str(compiled.exception), str(expected.exception))
+
+    it "respects hooks overridden by subclasses":
+        class Upper(sb.listof):
+            def normalise_filled(self, meta, val):
+                return [item.upper() for item in super(Upper, self).normalise_filled(meta, val)]
+
+        normalise = sb.set_options(a=Upper(sb.string_spec()), b=sb.defaulted(sb.string_spec(), "dflt")).compile()
+        self.assertEqual(normalise(self.meta, {"a": ["x", "y"]}), {"a": ["X", "Y"], "b": "dflt"})
+
+    it "uses normalise on things that aren't specs":
+        child = mock.Mock(name="child", spec_set=["normalise"])
+        child.normalise.return_value = 2
+        normalise = sb.listof(child).compile()
+        self.assertEqual(normalise(self.meta, [1]), [2])
+
+        (meta, val), _ = child.normalise.call_args
+        self.assertEqual((meta.path, val), ("[0]", 1))
+
+describe TestCase, "fail fast":
+    before_each:
+        self.meta = Meta({}, [], fail_fast=True)
+
+    it "makes set_options, dictof and listof raise the first error as is":
+        spec = sb.set_options(a=sb.dictof(sb.string_spec(), sb.listof(sb.integer_spec())), b=sb.integer_spec())
+
+        for normalise in (spec.normalise, spec.compile()):
+            with self.assertRaises(BadSpecValue) as error:
+                normalise(self.meta, {"a": {"c": [1, "d", "e"]}, "b": "f"})
+            self.assertEqual(error.exception.message, "Expected an integer")
+            self.assertEqual(error.exception.errors, [])
+            self.assertIn(error.exception.kwargs["meta"].path, ("a.c[1]", "b"))
+
+    it "makes apply_validators raise the first error":
+        error1 = BadSpecValue("one")
+        v1 = mock.Mock(name="v1", spec_set=["normalise"])
+        v1.normalise.side_effect = error1
+        v2 = mock.Mock(name="v2", spec_set=["normalise"])
+
+        with self.assertRaises(BadSpecValue) as error:
+            sb.apply_validators(self.meta, "val", [v1, v2])
+        self.assertIs(error.exception, error1)
+        self.assertEqual(v2.normalise.mock_calls, [])
+
+    it "can be turned on for a spec tree with fail_fast_spec":
+        meta = Meta({}, [])
+        spec = sb.listof(sb.integer_spec())
+        with self.assertRaises(BadSpecValue) as error:
+            spec.normalise(meta, ["a", "b"])
+        self.assertEqual(len(error.exception.errors), 2)
+
+        with self.assertRaises(BadSpecValue) as error:
+            sb.fail_fast_spec(spec).normalise(meta, ["a", "b"])
+        self.assertEqual(error.exception.message, "Expected an integer")
+        self.assertEqual(error.exception.kwargs["meta"].path, "[0]")
+
+describe TestCase, "streamed_listof":
+    before_each:
+        self.meta = Meta({}, [])
+
+    it "defaults to an empty iterator":
+        self.assertEqual(list(sb.streamed_listof(sb.integer_spec()).normalise(self.meta, NotSpecified)), [])
+
+    it "turns the value into a list if not a list or iterator":
+        self.assertEqual(list(sb.streamed_listof(sb.any_spec()).normalise(self.meta, "asdf")), ["asdf"])
+        self.assertEqual(list(sb.streamed_listof(sb.any_spec()).normalise(self.meta, (1, 2))), [(1, 2)])
+
+    it "lazily normalises items from an iterator":
+        seen = []
+        def items():
+            for item in ("1", "2", "3"):
+                seen.append(item)
+                yield item
+
+        result = sb.streamed_listof(sb.integer_spec()).normalise(self.meta, items())
+        self.assertEqual(seen, [])
+        self.assertEqual(next(result), 1)
+        self.assertEqual(seen, ["1"])
+        self.assertEqual(list(result), [2, 3])
+
+    it "raises an error when it gets to a bad item":
+        result = sb.streamed_listof(sb.integer_spec()).normalise(self.meta, iter([1, "a", 3]))
+        self.assertEqual(next(result), 1)
+        with self.assertRaises(BadSpecValue) as error:
+            next(result)
+        self.assertEqual([e.kwargs["meta"].path for e in error.exception.errors], ["[1]"])
+
+    it "can collect errors till the end":
+        result = sb.streamed_listof(sb.integer_spec(), collect_errors=True).normalise(self.meta, iter([1, "a", 3, "b"]))
+        self.assertEqual([next(result), next(result)], [1, 3])
+        with self.assertRaises(BadSpecValue) as error:
+            next(result)
+        self.assertEqual([e.kwargs["meta"].path for e in error.exception.errors], ["[1]", "[3]"])
+
+class lookup_spec(sb.Spec):
+    reads_everything = True
+
+    def normalise_filled(self, meta, val):
+        return meta.everything["vars"][val]
+
+describe TestCase, "normalising with an executor":
+    before_each:
+        self.meta = Meta({}, [])
+
+    def executor(self):
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+        except ImportError:
+            raise SkipTest("Need concurrent.futures for this test")
+        return ProcessPoolExecutor(max_workers=2)
+
+    it "can pickle the built in specs":
+        spec = sb.set_options(
+              a = sb.defaulted(sb.listof(sb.integer_spec()), [1])
+            , b = sb.required(sb.or_spec(sb.boolean(), sb.valid_string_spec()))
+            , c = sb.dictof(sb.string_spec(), sb.and_spec(sb.string_spec(), sb.float_spec()))
+            , d = sb.match_spec((bool, sb.overridden("yes")), fallback=sb.any_spec())
+            )
+        val = {"b": True, "c": {"x": "1.5"}, "d": False}
+        unpickled = pickle.loads(pickle.dumps(spec))
+        self.assertEqual(unpickled.normalise(self.meta, val), spec.normalise(self.meta, val))
+        self.assertEqual(unpickled.normalise(self.meta, val), {"a": [1], "b": True, "c": {"x": 1.5}, "d": "yes"})
+
+    it "normalises a listof in chunks":
+        with self.executor() as executor:
+            spec = sb.listof(sb.integer_spec(), executor=executor, chunksize=3)
+            self.assertEqual(spec.normalise(self.meta, [str(i) for i in range(10)]), list(range(10)))
+
+            with self.assertRaises(BadSpecValue) as error:
+                spec.normalise(self.meta, [1, "a", 3, 4, "b", 6, 7, "c"])
+            self.assertEqual([e.kwargs["meta"].path for e in error.exception.errors], ["[1]", "[4]", "[7]"])
+
+            with self.assertRaises(BadSpecValue) as error:
+                spec.normalise(self.meta.with_fail_fast(), [1, 2, 3, 4, "b", 6, 7, "c"])
+            self.assertEqual(error.exception.kwargs["meta"].path, "[4]")
+
+    it "normalises a dictof in chunks":
+        with self.executor() as executor:
+            spec = sb.dictof(sb.string_spec(), sb.integer_spec(), executor=executor, chunksize=2)
+            val = dict(("k{0}".format(i), str(i)) for i in range(5))
+            self.assertEqual(spec.normalise(self.meta, val), dict(("k{0}".format(i), i) for i in range(5)))
+
+            val["k1"] = "a"
+            val["k3"] = "b"
+            with self.assertRaises(BadSpecValue) as error:
+                spec.normalise(self.meta, val)
+            self.assertEqual(sorted(e.kwargs["meta"].path for e in error.exception.errors), ["k1", "k3"])
+
+    it "only sends meta.everything to the executor when the spec reads it":
+        everything = {"vars": {"a": 1, "b": 2}, "big": "x" * 10000}
+        meta = Meta(everything, []).at("items")
+
+        description = sb.describe_meta(sb.listof(sb.integer_spec()), meta)
+        self.assertIs(description[-1], None)
+        self.assertEqual(len(pickle.dumps(description)), len(pickle.dumps(sb.describe_meta(sb.listof(sb.integer_spec()), Meta({}, []).at("items")))))
+        self.assertIs(sb.describe_meta(sb.listof(lookup_spec()), meta)[-1], everything)
+
+        with self.executor() as executor:
+            spec = sb.listof(sb.integer_spec(), executor=executor, chunksize=2)
+            self.assertEqual(spec.normalise(meta, ["1", "2", "3"]), [1, 2, 3])
+            with self.assertRaises(BadSpecValue) as error:
+                spec.normalise(meta, ["1", "x", "3"])
+            self.assertEqual([(e.kwargs["meta"].path, e.kwargs["meta"].everything) for e in error.exception.errors], [("items[1]", everything)])
+
+            spec = sb.listof(lookup_spec(), executor=executor, chunksize=2)
+            self.assertEqual(spec.normalise(meta, ["a", "b", "a"]), [1, 2, 1])
+
+    it "can share meta.everything with the executor workers":
+        everything = {"vars": {"a": 1}}
+        meta = Meta(everything, [])
+        try:
+            sb.share_everything(everything)
+            self.assertIs(sb.describe_meta(sb.formatted(sb.string_spec(), formatter=None), meta)[-1], sb.SharedEverything)
+            self.assertIs(sb.rebuild_meta(sb.describe_meta(sb.formatted(sb.string_spec(), formatter=None), meta)).everything, everything)
+        finally:
+            sb.share_everything(None)
+
+describe TestCase, "memoised":
+    before_each:
+        self.meta = Meta({}, [])
+
+    it "remembers what hashable values normalise into":
+        spec = mock.Mock(name="spec", spec=sb.integer_spec())
+        spec.normalise.return_value = 1
+        with mock.patch.object(sb, "is_cacheable", lambda spec, with_filesystem: True):
+            memo = sb.memoised(spec)
+
+        self.assertEqual(memo.normalise(self.meta, "1"), 1)
+        self.assertEqual(memo.normalise(self.meta, "1"), 1)
+        self.assertEqual(spec.normalise.mock_calls, [mock.call(self.meta, "1")])
+        self.assertEqual(memo.stats(), {"hits": 1, "misses": 1, "size": 1, "maxsize": 1024})
+
+    it "remembers equal values of different types separately":
+        memo = sb.memoised(sb.or_spec(sb.boolean(), sb.integer_spec()))
+        self.assertIs(memo.normalise(self.meta, True), True)
+        self.assertEqual(type(memo.normalise(self.meta, 1)), int)
+
+    it "doesn't remember unhashable values, errors or NotSpecified":
+        memo = sb.memoised(sb.optional_spec(sb.any_spec()))
+        self.assertEqual(memo.normalise(self.meta, [1]), [1])
+        self.assertIs(memo.normalise(self.meta, NotSpecified), NotSpecified)
+
+        memo = sb.memoised(sb.integer_spec())
+        for _ in range(2):
+            with self.assertRaises(BadSpecValue):
+                memo.normalise(self.meta, "nope")
+        self.assertEqual(memo.stats()["size"], 0)
+
+    it "forgets the least recently used values":
+        memo = sb.memoised(sb.integer_spec(), maxsize=2)
+        for val in ("1", "2", "1", "3"):
+            memo.normalise(self.meta, val)
+        self.assertEqual(sorted(key for _, key in memo.cache.entries), ["1", "3"])
+
+    it "only memoises specs that touch the filesystem with a ttl":
+        with self.fuzzyAssertRaisesError(sb.ProgrammerError):
+            sb.memoised(sb.filename_spec())
+        with self.fuzzyAssertRaisesError(sb.ProgrammerError):
+            sb.memoised(sb.and_spec(sb.string_spec(), sb.directory_spec()))
+
+        memo = sb.memoised(sb.filename_spec(), ttl=5)
+        self.assertEqual(memo.cache.ttl, 5)
+        sb.memoised(sb.and_spec(sb.string_spec(), sb.directory_spec()), ttl=5)
+
+    it "doesn't memoise specs that aren't cacheable even with a ttl":
+        formatter = mock.Mock(name="formatter")
+        for spec in (sb.listof(sb.string_spec()), sb.formatted(sb.string_spec(), formatter=formatter), sb.create_spec(mock.Mock(name="kls"))):
+            for ttl in (None, 60):
+                with self.fuzzyAssertRaisesError(sb.ProgrammerError):
+                    sb.memoised(spec, ttl=ttl)
+
+    it "doesn't trust cacheable on subclasses that normalise differently":
+        class lookup_spec(sb.string_spec):
+            def normalise_filled(self, meta, val):
+                return meta.everything[val]
+
+        class checked(validators.Validator):
+            def validate(self, meta, val):
+                return val
+
+        self.assertFalse(sb.is_cacheable(lookup_spec()))
+        self.assertFalse(sb.is_cacheable(checked()))
+
+        spec = sb.string_spec()
+        spec.normalise_filled = lambda meta, val: meta.everything[val]
+        self.assertFalse(sb.is_cacheable(spec))
+
+        with self.fuzzyAssertRaisesError(sb.ProgrammerError):
+            sb.memoised(lookup_spec())
+
+    it "knows which specs are cacheable":
+        self.assertTrue(sb.is_cacheable(sb.valid_string_spec(validators.no_dots())))
+        self.assertTrue(sb.is_cacheable(sb.string_choice_spec(["a"])))
+        self.assertFalse(sb.is_cacheable(sb.filename_spec()))
+        self.assertTrue(sb.is_cacheable(sb.filename_spec(), with_filesystem=True))
+        self.assertTrue(sb.is_cacheable(sb.match_spec((int, sb.integer_spec()), fallback=sb.string_spec())))
+        self.assertFalse(sb.is_cacheable(sb.or_spec(sb.string_spec(), sb.filename_spec())))
+        self.assertFalse(sb.is_cacheable(sb.formatted(sb.string_spec(), formatter=mock.Mock(name="formatter"))))
+        self.assertFalse(sb.is_cacheable(mock.Mock(name="spec")))
+
+describe TestCase, "reads_everything":
+    it "knows which specs look at meta.everything":
+        formatter = mock.Mock(name="formatter")
+        self.assertTrue(sb.reads_everything(sb.set_options(a=sb.listof(sb.formatted(sb.string_spec(), formatter=formatter)))))
+        self.assertTrue(sb.reads_everything(sb.or_spec(sb.string_spec(), sb.many_format(sb.string_spec(), formatter=formatter))))
+        self.assertFalse(sb.reads_everything(sb.set_options(a=sb.listof(sb.string_spec()))))
+        self.assertFalse(sb.reads_everything(mock.Mock(name="spec")))
+
+    it "assumes specs look at meta.everything unless their class says otherwise":
+        class custom_spec(sb.Spec):
+            def normalise_filled(self, meta, val):
+                return meta.everything["vars"][val]
+
+        class custom_string_spec(sb.string_spec):
+            def normalise_filled(self, meta, val):
+                return meta.everything["vars"][val]
+
+        self.assertTrue(sb.reads_everything(custom_spec()))
+        self.assertTrue(sb.reads_everything(sb.set_options(a=sb.listof(custom_string_spec()))))
+
+        spec = sb.set_options(a=custom_spec())
+        val = {"a": "x"}
+        result = spec.normalise(Meta({"vars": {"x": 1}}, []), val)
+        self.assertEqual(spec.renormalise(Meta({"vars": {"x": 2}}, []), val, result, dict(val)), {"a": 2})
+
+describe TestCase, "renormalise":
+    before_each:
+        self.meta = Meta({}, [])
+
+    it "gives back the previous result if nothing changed":
+        spec = sb.integer_spec()
+        self.assertEqual(spec.renormalise(self.meta, "1", 1, "1"), 1)
+        self.assertEqual(spec.renormalise(self.meta, "1", 1, "2"), 2)
+        self.assertEqual(type(spec.renormalise(self.meta, True, True, 1)), int)
+
+    it "only renormalises the values that changed":
+        leaf = sb.integer_spec()
+        spec = sb.set_options(a=sb.dictof(sb.string_spec(), sb.listof(leaf)), b=sb.defaulted(sb.set_options(c=leaf), {}))
+        previous = {"a": {"d": ["1"], "e": ["2"]}, "b": {"c": "3"}}
+        result = spec.normalise(self.meta, previous)
+
+        val = {"a": {"d": ["1"], "e": ["4"], "f": "5"}, "b": {"c": "3"}}
+        with mock.patch.object(sb.integer_spec, "normalise", autospec=True, side_effect=sb.integer_spec.normalise) as normalise:
+            new = spec.renormalise(self.meta, previous, result, val)
+        self.assertEqual(new, spec.normalise(self.meta, val))
+        self.assertEqual(sorted(call[1][2] for call in normalise.mock_calls), ["4", "5"])
+
+        self.assertIs(new["a"]["d"], result["a"]["d"])
+        self.assertIs(new["b"], result["b"])
+        self.assertIsNot(new["a"], result["a"])
+
+    it "reuses objects made by create_spec if nothing changed":
+        Thing = namedlist("Thing", ["one", "two"])
+        spec = sb.listof(sb.create_spec(Thing, one=sb.set_options(a=sb.integer_spec()), two=sb.integer_spec()))
+        spec = sb.create_spec(Thing, one=spec, two=sb.create_spec(Thing, one=sb.integer_spec(), two=sb.integer_spec()))
+
+        previous = {"one": [{"one": {"a": "1"}, "two": "2"}], "two": {"one": "3", "two": "4"}}
+        result = spec.normalise(self.meta, previous)
+
+        val = {"one": [{"one": {"a": "1"}, "two": "2"}], "two": {"one": "3", "two": "5"}}
+        new = spec.renormalise(self.meta, previous, result, val)
+        self.assertEqual(new, Thing([Thing({"a": 1}, 2)], Thing(3, 5)))
+        self.assertIsNot(new.two, result.two)
+
+        self.assertIs(spec.renormalise(self.meta, previous, result, dict(previous)), result)
+
+    it "doesn't give the values made by create_spec's kls back to it":
+        class Thing(object):
+            def __init__(self, one, two):
+                self.one = one * 2
+                self.two = two
+
+        spec = sb.create_spec(Thing, one=sb.integer_spec(), two=sb.integer_spec())
+        previous = {"one": "1", "two": "2"}
+        result = spec.normalise(self.meta, previous)
+        self.assertEqual((result.one, result.two), (2, 2))
+
+        new = spec.renormalise(self.meta, previous, result, {"one": "1", "two": "3"})
+        self.assertEqual((new.one, new.two), (2, 3))
+
+    it "always renormalises specs that look at meta.everything":
+        formatter = lambda options, path, value: mock.Mock(name="formatted", format=lambda: options["name"])
+        spec = sb.set_options(a=sb.formatted(sb.string_spec(), formatter=formatter), b=sb.string_spec())
+
+        previous = {"a": "{name}", "b": "c", "name": "one"}
+        result = spec.normalise(Meta(previous, []), previous)
+        self.assertEqual(result, {"a": "one", "b": "c"})
+
+        val = {"a": "{name}", "b": "c", "name": "two"}
+        self.assertEqual(spec.renormalise(Meta(val, []), previous, result, val), {"a": "two", "b": "c"})
+
+    it "collects errors from the changed values":
+        spec = sb.dictof(sb.string_spec(), sb.integer_spec())
+        previous = {"a": "1", "b": "2"}
+        result = spec.normalise(self.meta, previous)
+
+        with self.assertRaises(BadSpecValue) as error:
+            spec.renormalise(self.meta, previous, result, {"a": "1", "b": "c", "d": "e"})
+        self.assertEqual(sorted(error.kwargs["meta"].path for error in error.exception.errors), ["b", "d"])
+
+    it "normalises from scratch if the previous values don't fit":
+        spec = sb.set_options(a=sb.integer_spec())
+        self.assertEqual(spec.renormalise(self.meta, NotSpecified, NotSpecified, {"a": "1"}), {"a": 1})
+        self.assertEqual(spec.renormalise(self.meta, {"a": "1"}, None, {"a": "2"}), {"a": 2})
@@ -0,0 +1,137 @@
+# coding: spec
+
+from input_algorithms.tracing import Tracer, traced, install, uninstall
+from input_algorithms.errors import BadSpecValue
+from input_algorithms import spec_base as sb
+from input_algorithms import validators
+from input_algorithms.meta import Meta
+
+from tests.helpers import TestCase
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from unittest import SkipTest
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.events = []
+
+    def enter(self, spec, path):
+        self.events.append(("enter", spec.__class__.__name__, path))
+
+    def leave(self, spec, path, seconds, error):
+        assert seconds >= 0
+        self.events.append(("leave", spec.__class__.__name__, path, error is not None))
+
+    def default_used(self, spec, path):
+        self.events.append(("default_used", spec.__class__.__name__, path))
+
+    def validator_failed(self, validator, path, error):
+        self.events.append(("validator_failed", validator.__class__.__name__, path))
+
+    def children_failed(self, spec, path, errors):
+        self.events.append(("children_failed", spec.__class__.__name__, path, len(errors)))
+
+describe TestCase, "tracing":
+    before_each:
+        self.meta = Meta({}, [])
+        self.spec = sb.set_options(
+              a = sb.defaulted(sb.integer_spec(), 1)
+            , b = sb.listof(sb.valid_string_spec(validators.no_dots()))
+            )
+
+    it "tells the tracer about normalising":
+        tracer = RecordingTracer()
+        with traced(tracer):
+            self.assertEqual(self.spec.normalise(self.meta, {"b": "c"}), {"a": 1, "b": ["c"]})
+
+        self.assertEqual(sorted(tracer.events), sorted([
+              ("enter", "set_options", "")
+            , ("enter", "defaulted", "a")
+            , ("default_used", "defaulted", "a")
+            , ("leave", "defaulted", "a", False)
+            , ("enter", "listof", "b")
+            , ("enter", "valid_string_spec", "b[0]")
+            , ("enter", "no_dots", "b[0]")
+            , ("leave", "no_dots", "b[0]", False)
+            , ("leave", "valid_string_spec", "b[0]", False)
+            , ("leave", "listof", "b", False)
+            , ("leave", "set_options", "", False)
+            ]))
+        self.assertEqual(tracer.events[0], ("enter", "set_options", ""))
+        self.assertEqual(tracer.events[-1], ("leave", "set_options", "", False))
+
+    it "tells the tracer about failures":
+        tracer = RecordingTracer()
+        with traced(tracer):
+            with self.assertRaises(BadSpecValue):
+                self.spec.normalise(self.meta, {"a": 2, "b": ["c.d", "e.f"]})
+
+        failures = [event for event in tracer.events if event[0] != "enter" and event[0:2] not in (("leave", "integer_spec"), ("leave", "no_dots"))]
+        self.assertEqual(failures, [
+              ("leave", "defaulted", "a", False)
+            , ("validator_failed", "no_dots", "b[0]")
+            , ("leave", "valid_string_spec", "b[0]", True)
+            , ("validator_failed", "no_dots", "b[1]")
+            , ("leave", "valid_string_spec", "b[1]", True)
+            , ("children_failed", "listof", "b", 2)
+            , ("leave", "listof", "b", True)
+            , ("children_failed", "set_options", "", 1)
+            , ("leave", "set_options", "", True)
+            ])
+
+    it "tells the tracer about containers that fail when compiled":
+        spec = sb.set_options(a=sb.listof(sb.integer_spec()), b=sb.dictof(sb.string_spec(), sb.integer_spec()))
+        normalise = spec.compile()
+        tracer = RecordingTracer()
+        with traced(tracer):
+            with self.assertRaises(BadSpecValue):
+                normalise(self.meta, {"a": ["x", 1.5], "b": {"c": "d"}})
+
+        self.assertEqual(sorted(event for event in tracer.events if event[0] == "children_failed"), [
+              ("children_failed", "dictof", "b", 1)
+            , ("children_failed", "listof", "a", 2)
+            , ("children_failed", "set_options", "", 2)
+            ])
+
+    it "tells the tracer about containers that fail with an executor":
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+        except ImportError:
+            raise SkipTest("Need concurrent.futures for this test")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            spec = sb.set_options(a=sb.listof(sb.integer_spec(), executor=executor, chunksize=1), b=sb.dictof(sb.string_spec(), sb.integer_spec(), executor=executor))
+            tracer = RecordingTracer()
+            with traced(tracer):
+                with self.assertRaises(BadSpecValue):
+                    spec.normalise(self.meta, {"a": ["x", 1.5, 2], "b": {"c": "d"}})
+
+        self.assertEqual(sorted(event for event in tracer.events if event[0] == "children_failed"), [
+              ("children_failed", "dictof", "b", 1)
+            , ("children_failed", "listof", "a", 2)
+            , ("children_failed", "set_options", "", 2)
+            ])
+
+    it "only traces one in every sample documents":
+        tracer = RecordingTracer()
+        with traced(tracer, sample=3):
+            for index in range(6):
+                try:
+                    self.spec.normalise(self.meta.at(str(index)), {"b": ["c.d"]} if index == 4 else {})
+                except BadSpecValue:
+                    self.assertEqual(index, 4)
+
+        self.assertEqual(sorted(set(event[2] for event in tracer.events if event[0] == "enter" and event[1] == "set_options")), ["0", "3"])
+        self.assertEqual([event for event in tracer.events if event[0] in ("validator_failed", "children_failed")], [])
+
+    it "puts back the previous tracer":
+        self.assertIs(sb.tracer, None)
+        first = RecordingTracer()
+        install(first)
+        try:
+            with traced(RecordingTracer()) as second:
+                self.assertIs(sb.tracer.tracer, second)
+            self.assertIs(sb.tracer.tracer, first)
+        finally:
+            uninstall()
+        self.assertIs(sb.tracer, None)
@@ -147,6 +147,40 @@ describe TestCase, "regexed":
         with self.fuzzyAssertRaisesError(BadSpecValue, "Expected value to match regex, it didn't", spec="blah", meta=self.meta, val=val):
             va.regexed("meh", "m.+", "blah", "other").normalise(self.meta, val)
 
+describe TestCase, "combined_regex":
+    it "combines characters and patterns into one regex":
+        regex, others = va.combined_regex([va.no_whitespace(), va.no_dots(), va.regexed("[a-z]+", "a"), va.no_dots()])
+        self.assertEqual(regex.pattern, "(?![^\\s.]*[\\s.])(?=(?:[a-z]+))(?=(?:a))")
+        self.assertEqual(others, [])
+
+        assert regex.match("abc")
+        for val in ("a c", "a.c", "bc", "1", "a\n"):
+            assert not regex.match(val), val
+
+    it "shares regexes made from the same checks":
+        one, _ = va.combined_regex([va.no_dots(), va.regexed("b+")])
+        two, _ = va.combined_regex([va.no_dots(), va.regexed("b+")])
+        self.assertIs(one, two)
+
+    it "leaves validators that can't be combined":
+        class picky_dots(va.no_dots):
+            def validate(self, meta, val):
+                return val
+
+        validators = [va.regexed("(a)"), va.regexed("(?i)a"), va.choice(1), picky_dots(), mock.Mock(name="validator")]
+        self.assertEqual(va.combined_regex(validators), (None, validators))
+
+    it "only combines the validators before the first that can't be combined":
+        validators = [va.no_dots(), va.choice("a"), va.no_whitespace()]
+        regex, others = va.combined_regex(validators)
+        self.assertEqual(regex.pattern, "(?![^.]*[.])")
+        self.assertEqual(others, validators[1:])
+
+    it "doesn't combine regexes with flags":
+        self.assertIs(va.regexed("(?i)a").combinable(), None)
+        self.assertIs(va.regexed("(?s)a.b").combinable(), None)
+        self.assertEqual(va.regexed("a.b").combinable(), ([], ["a.b"]))
+
 describe TestCase, "deprecated_key":
     before_each:
         self.meta = mock.Mock(name="meta")
@@ -187,3 +221,9 @@ describe TestCase, "choice":
     it "returns the val if it's one of the choices":
         self.assertIs(va.choice(1, 2, 3, 4).normalise(self.meta, 4), 4)
 
+    it "works with unhashable choices":
+        validator = va.choice([1], "two")
+        self.assertEqual(validator.normalise(self.meta, [1]), [1])
+        self.assertEqual(validator.normalise(self.meta, "two"), "two")
+        with self.fuzzyAssertRaisesError(BadSpecValue, "Expected the value to be one of the valid choices", got=[2], choices=([1], "two"), meta=self.meta):
+            validator.normalise(self.meta, [2])